@@ -1,12 +1,32 @@
 import os
 import sys
 import time
+import ast
+import re
 import json
+import hmac
+import queue
+import random
+import asyncio
+import argparse
+import sqlite3
+import fcntl
+import atexit
+import shutil
+import hashlib
+import resource
+import itertools
+import contextlib
+import collections
+import concurrent.futures
+import threading
 import subprocess
+import http.server
 import requests
 import tempfile
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import traceback
 import importlib
 
@@ -23,9 +43,56 @@ logger = logging.getLogger("aiter_api_watcher")
 
 # Configuration file path
 CONFIG_FILE = "aiter_api_watcher_config.json"
+STATE_DB_FILE = "aiter_api_watcher_state.db"
+STATE_DB = None  # Connection to the SQLite state store, opened by open_state_store
+STATE_NAMESPACE = None  # Name of the watch target whose cursors this process reads and moves
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
 NOTIFICATION_REPO = "EmbeddedLLM/aiter-api-watcher"
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_SESSION = None
+NOTIFICATION_OUTBOX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aiter_api_watcher", "outbox")
+NOTIFICATION_MAX_RETRIES = 5
+NOTIFICATION_MAX_WAIT = 900  # Longest rate limit wait in seconds before leaving issues in the outbox
+GITHUB_TIMEOUT = 30  # Seconds a GitHub request may take before it counts as failed
 CHECK_INTERVAL = 3600  # Check every hour by default
+MAX_CONCURRENT_CHECKS = 2  # Watch target checks running at the same time
+SCHEDULE_JITTER = 0.1  # Random share added to or removed from every scheduling delay
+FAILURE_BACKOFF = 60  # Seconds before the first retry of a failed watch target
+WEBHOOK_DEBOUNCE = 30  # Seconds to collect a burst of pushes into one check
+WEBHOOK_MAX_BODY = 25 * 1024 * 1024  # GitHub caps webhook payloads at 25 MB
+MIRROR_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aiter_api_watcher", "mirrors")
+MIRROR_CACHE_MAX_SIZE_GB = 20
+MIRROR_CACHE_MAX_AGE_DAYS = 30
+INSPECTION_TIMEOUT = 600  # Seconds allowed for each import and each function lookup
+NOTIFY_ON = ["breaking", "compatible"]  # Change classes that create issues
+PRELOAD_MODULES = ["torch", "triton", "numpy"]  # Imported once by the inspection server
+# Modules the stub extractor always replaces: GPU-only dependencies and aiter's JIT-compiled extensions
+STUB_MODULES = ["triton", "triton.*", "hip", "hip.*", "hipbsolidxgemm", "rocsolidxgemm", "aiter.jit.module_*", "module_*"]
+INSPECTION_SERVER = None  # Warm inspection server of this process, False if it failed to start this cycle
+SNAPSHOT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aiter_api_watcher", "snapshots")
+SNAPSHOT_CACHE_MAX_SIZE_MB = 1024
+SNAPSHOT_EXTRACTOR_VERSION = 1  # Bump when extraction results change, to invalidate cached snapshots
+SNAPSHOT_CACHE_STATS = {"hits": 0, "misses": 0}
+BUILD_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aiter_api_watcher", "builds")
+BUILD_INPUT_PATHS = ["setup.py", "pyproject.toml", "csrc", "hsa", "3rdparty"]
+IMPORT_GRAPH_CACHE = {}  # Import graph of the monitored functions per mirror, reused across commits
+CHANGED_PATHS_CACHE = {}
+MODULE_SURFACE_CACHE = {}  # Public callables of a module file by git blob id
+COMMIT_INDEX = {}  # Commit metadata by hash, filled by load_commit_metadata
+COMMIT_LOG_FORMAT = "%x1e%H%x00%P%x00%an%x00%ae%x00%aI%x00%s%x00"
+COMMIT_HEADER_FIELDS = 6
+WORKER_INSTALL_DIR = None  # Private install location of a parallel worker process
+STAGE_METRICS = {}  # Runs, seconds and failures of each stage in the current cycle
+CYCLE_COUNTERS = collections.Counter()  # Commits checked, bytes fetched and issues of the current cycle
+RUN_LOG_FILE = "aiter_api_watcher_runs.jsonl"
+COMPARE_MATRIX_OUTPUT = "aiter_api_compatibility"  # Written as .json and .md
+IMPORT_PROFILE_REPEATS = 3  # Fresh interpreters per profiled import, the fastest run counts
+IMPORT_REGRESSION_THRESHOLD = 0.2  # Relative import time or peak RSS growth that files an issue
+IMPORT_REGRESSION_MIN_SECONDS = 0.2
+IMPORT_REGRESSION_MIN_MB = 50
+IMPORT_REGRESSION_TOP_MODULES = 10
+METRICS_TEXTFILE = "aiter_api_watcher.prom"
 
 
 def load_config():
@@ -47,12 +114,54 @@ def load_config():
                 }
             ],
             "check_interval_seconds": CHECK_INTERVAL,
-            "last_checked_commit": "",
             "start_commit": "",  # User can specify which commit to start with
             "repository_url": "https://github.com/ROCm/aiter.git",
             "notification_repo": "EmbeddedLLM/aiter-api-watcher",
             "commit_list": [],
-            "compare_pair": []
+            "compare_pair": [],
+            "bisect_pair": [],
+            "compare_matrix": [],
+            "compare_matrix_output": COMPARE_MATRIX_OUTPUT,
+            "import_profiling": False,
+            "import_profile_repeats": IMPORT_PROFILE_REPEATS,
+            "import_regression_threshold": IMPORT_REGRESSION_THRESHOLD,
+            "import_regression_min_seconds": IMPORT_REGRESSION_MIN_SECONDS,
+            "import_regression_min_mb": IMPORT_REGRESSION_MIN_MB,
+            "mirror_cache_dir": "",
+            "mirror_cache_max_size_gb": MIRROR_CACHE_MAX_SIZE_GB,
+            "mirror_cache_max_age_days": MIRROR_CACHE_MAX_AGE_DAYS,
+            "signature_extractor": "import",
+            "stub_modules": STUB_MODULES,
+            "stub_missing_modules": True,
+            "batch_inspection": True,
+            "inspection_timeout_seconds": INSPECTION_TIMEOUT,
+            "snapshot_cache_dir": "",
+            "snapshot_cache_max_size_mb": SNAPSHOT_CACHE_MAX_SIZE_MB,
+            "skip_irrelevant_commits": True,
+            "parallel_workers": 1,
+            "worker_memory_limit_mb": 0,
+            "build_reuse": True,
+            "submodule_reference_cache": True,
+            "submodule_cache_dir": "",
+            "build_cache_dir": "",
+            "build_input_paths": BUILD_INPUT_PATHS,
+            "github_api_url": GITHUB_API_URL,
+            "notification_outbox_dir": "",
+            "notification_digest": False,
+            "notify_on": NOTIFY_ON,
+            "modules_to_monitor": [],
+            "state_db": STATE_DB_FILE,
+            "run_log_file": RUN_LOG_FILE,
+            "metrics_textfile": METRICS_TEXTFILE,
+            "watch_targets": [],
+            "max_concurrent_checks": MAX_CONCURRENT_CHECKS,
+            "schedule_jitter": SCHEDULE_JITTER,
+            "failure_backoff_seconds": FAILURE_BACKOFF,
+            "webhook_listen": "",
+            "webhook_secret": "",
+            "webhook_debounce_seconds": WEBHOOK_DEBOUNCE,
+            "inspection_server": True,
+            "preload_modules": PRELOAD_MODULES
         }
         with open(CONFIG_FILE, 'w') as f:
             json.dump(default_config, f, indent=2)
@@ -63,74 +172,1054 @@ def load_config():
 
 def save_config(config):
     """Save configuration to JSON file"""
-    with open(CONFIG_FILE, 'w') as f:
+    # Write a temporary file and rename it, so a crash never leaves a truncated config
+    temp_path = f"{CONFIG_FILE}.tmp"
+    with open(temp_path, 'w') as f:
         json.dump(config, f, indent=2)
+    os.replace(temp_path, CONFIG_FILE)
 
-def get_latest_commit(repo_url):
-    """Get the latest commit hash from the repository"""
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    commit_hash TEXT,
+    function_path TEXT NOT NULL,
+    import_statement TEXT,
+    exists_at_commit INTEGER NOT NULL,
+    signature TEXT,
+    parameters TEXT,
+    source_hash TEXT REFERENCES blobs(hash),
+    error TEXT,
+    extractor TEXT,
+    recorded_at TEXT NOT NULL,
+    UNIQUE (commit_hash, function_path)
+);
+CREATE TABLE IF NOT EXISTS surfaces (
+    id INTEGER PRIMARY KEY,
+    commit_hash TEXT,
+    module TEXT NOT NULL,
+    surface_hash TEXT NOT NULL REFERENCES blobs(hash),
+    recorded_at TEXT NOT NULL,
+    UNIQUE (commit_hash, module)
+);
+CREATE TABLE IF NOT EXISTS signature_intervals (
+    id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    function_path TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    first_commit TEXT NOT NULL,
+    first_date TEXT NOT NULL,
+    last_commit TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    end_commit TEXT,
+    end_date TEXT
+);
+CREATE INDEX IF NOT EXISTS signature_intervals_by_function ON signature_intervals (target, function_path, first_date);
+CREATE INDEX IF NOT EXISTS signature_intervals_by_date ON signature_intervals (target, first_date);
+CREATE TABLE IF NOT EXISTS commits (
+    commit_hash TEXT PRIMARY KEY,
+    date TEXT,
+    info TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commits_by_date ON commits (date);
+CREATE TABLE IF NOT EXISTS commit_targets (
+    target TEXT NOT NULL,
+    commit_hash TEXT NOT NULL REFERENCES commits(commit_hash),
+    PRIMARY KEY (target, commit_hash)
+);
+CREATE TABLE IF NOT EXISTS import_profiles (
+    id INTEGER PRIMARY KEY,
+    commit_hash TEXT,
+    import_statement TEXT NOT NULL,
+    wall_seconds REAL,
+    peak_rss_kb INTEGER,
+    modules_hash TEXT REFERENCES blobs(hash),
+    error TEXT,
+    recorded_at TEXT NOT NULL,
+    UNIQUE (commit_hash, import_statement)
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    outbox_dir TEXT NOT NULL,
+    repo TEXT,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    mode INTEGER,
+    status TEXT NOT NULL,
+    error TEXT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+"""
+
+def open_state_store(config):
+    """Open the SQLite state store, creating its tables on first use"""
+    global STATE_DB
+    path = os.path.expanduser(config.get("state_db") or STATE_DB_FILE)
+    STATE_DB = sqlite3.connect(path)
+    STATE_DB.execute("PRAGMA journal_mode=WAL")
+    STATE_DB.execute("PRAGMA synchronous=NORMAL")
+    STATE_DB.executescript(STATE_SCHEMA)
+    logger.info(f"Using state store {path}")
+    return STATE_DB
+
+def now_iso():
+    """Get the current UTC time as an ISO 8601 string"""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def utc_iso(date):
+    """Convert an ISO 8601 date with any offset to UTC, so dates compare as strings"""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(datetime.fromisoformat(date).timestamp()))
+
+def store_blob(content):
+    """Store a text once by its hash and return the hash"""
+    if content is None:
+        return None
+    blob_hash = hashlib.sha256(content.encode()).hexdigest()
+    STATE_DB.execute("INSERT OR IGNORE INTO blobs (hash, content) VALUES (?, ?)", (blob_hash, content))
+    return blob_hash
+
+def load_blob(blob_hash):
+    """Load a text stored by store_blob"""
+    if blob_hash is None:
+        return None
+    row = STATE_DB.execute("SELECT content FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+    return row[0] if row else None
+
+def cursor_name(name):
+    """Qualify a cursor name with the watch target of this process"""
+    return f"{STATE_NAMESPACE}/{name}" if STATE_NAMESPACE else name
+
+def get_cursor(name, default=None):
+    """Get a named position of the watcher, such as the last checked commit"""
+    row = STATE_DB.execute("SELECT value FROM cursors WHERE name = ?", (cursor_name(name),)).fetchone()
+    return row[0] if row else default
+
+def set_cursor(name, value):
+    """Move a named position of the watcher"""
+    STATE_DB.execute(
+        "INSERT OR REPLACE INTO cursors (name, value, updated_at) VALUES (?, ?, ?)",
+        (cursor_name(name), value, now_iso())
+    )
+
+def record_snapshot(commit, func_config, snapshot):
+    """Store the signature of a function at a commit and return the snapshot id"""
+    STATE_DB.execute(
+        # Update in place, so cursors of other watch targets keep pointing at the row
+        "INSERT INTO snapshots (commit_hash, function_path, import_statement, exists_at_commit, "
+        "signature, parameters, source_hash, error, extractor, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (commit_hash, function_path) DO UPDATE SET import_statement = excluded.import_statement, "
+        "exists_at_commit = excluded.exists_at_commit, signature = excluded.signature, "
+        "parameters = excluded.parameters, source_hash = excluded.source_hash, error = excluded.error, "
+        "extractor = excluded.extractor, recorded_at = excluded.recorded_at",
+        (
+            commit,
+            func_config["function_path"],
+            func_config.get("import_statement"),
+            int(bool(snapshot.get("exists"))),
+            snapshot.get("signature"),
+            json.dumps(snapshot.get("parameters")),
+            store_blob(snapshot.get("source")),
+            snapshot.get("error"),
+            snapshot.get("extractor", "import"),
+            now_iso()
+        )
+    )
+    snapshot_id = STATE_DB.execute(
+        "SELECT id FROM snapshots WHERE commit_hash IS ? AND function_path = ? ORDER BY id DESC LIMIT 1",
+        (commit, func_config["function_path"])
+    ).fetchone()[0]
+    update_signature_history(commit, func_config["function_path"], snapshot_id, snapshot)
+    return snapshot_id
+
+def update_signature_history(commit, function_path, snapshot_id, snapshot):
+    """Extend the open signature interval of a function to a commit, or start a new interval
+
+    An interval runs from the first to the last inspected commit with the same signature,
+    and ends at the first commit with a different one. Commits dated before the open
+    interval, such as a commit list scanned out of order, are left out of the index.
+    """
+    commit_date = COMMIT_INDEX.get(commit, {}).get("date")
+    if commit is None or commit_date is None:
+        return
+    commit_date = utc_iso(commit_date)
+    target = STATE_NAMESPACE or ""
+    row = STATE_DB.execute(
+        "SELECT id, snapshot_id, first_commit, last_commit, last_date FROM signature_intervals "
+        "WHERE target = ? AND function_path = ? AND end_commit IS NULL ORDER BY id DESC LIMIT 1",
+        (target, function_path)
+    ).fetchone()
+    if row is not None:
+        interval_id, interval_snapshot_id, first_commit, last_commit, last_date = row
+        if commit in (first_commit, last_commit) or commit_date < last_date:
+            return
+        if not signature_changed(load_snapshot_record(interval_snapshot_id), snapshot):
+            STATE_DB.execute(
+                "UPDATE signature_intervals SET last_commit = ?, last_date = ? WHERE id = ?",
+                (commit, commit_date, interval_id)
+            )
+            return
+        STATE_DB.execute(
+            "UPDATE signature_intervals SET end_commit = ?, end_date = ? WHERE id = ?",
+            (commit, commit_date, interval_id)
+        )
+    STATE_DB.execute(
+        "INSERT INTO signature_intervals (target, function_path, snapshot_id, first_commit, first_date, "
+        "last_commit, last_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (target, function_path, snapshot_id, commit, commit_date, commit, commit_date)
+    )
+
+def record_commit(commit, commit_info):
+    """Store the metadata of an inspected commit, so its results can be replayed without git"""
+    date = commit_info.get("date")
+    STATE_DB.execute(
+        "INSERT OR IGNORE INTO commits (commit_hash, date, info, recorded_at) VALUES (?, ?, ?, ?)",
+        (commit, utc_iso(date) if date else None, json.dumps(commit_info), now_iso())
+    )
+    # Watch targets share the commits table, so each target remembers the commits it checked
+    STATE_DB.execute(
+        "INSERT OR IGNORE INTO commit_targets (target, commit_hash) VALUES (?, ?)", (STATE_NAMESPACE or "", commit)
+    )
+
+def load_snapshot_record(snapshot_id):
+    """Load a stored snapshot as the result dict of the inspection"""
+    row = STATE_DB.execute(
+        "SELECT exists_at_commit, signature, parameters, source_hash, error, extractor FROM snapshots WHERE id = ?",
+        (snapshot_id,)
+    ).fetchone()
+    if row is None:
+        return {}
+    return {
+        "exists": bool(row[0]),
+        "signature": row[1],
+        "parameters": json.loads(row[2]),
+        "source": load_blob(row[3]),
+        "error": row[4],
+        "extractor": row[5]
+    }
+
+def get_last_signature(func_config):
+    """Get the last recorded signature of a function, or {} if it was never checked"""
+    snapshot_id = get_cursor(f"last_signature:{func_config['function_path']}")
+    return load_snapshot_record(int(snapshot_id)) if snapshot_id is not None else {}
+
+def set_last_signature(commit, func_config, snapshot):
+    """Record the signature of a function at a commit as its last signature"""
+    snapshot_id = record_snapshot(commit, func_config, snapshot)
+    set_cursor(f"last_signature:{func_config['function_path']}", str(snapshot_id))
+
+def get_last_surface(module_config):
+    """Get the last recorded surface of a monitored module, or None if it was never checked"""
+    surface_id = get_cursor(f"last_surface:{module_config['module']}")
+    if surface_id is None:
+        return None
+    row = STATE_DB.execute("SELECT surface_hash FROM surfaces WHERE id = ?", (int(surface_id),)).fetchone()
+    return json.loads(load_blob(row[0])) if row else None
+
+def set_last_surface(commit, module_config, surface):
+    """Record the surface of a monitored module at a commit as its last surface"""
+    surface_hash = store_blob(json.dumps(surface, sort_keys=True))
+    STATE_DB.execute(
+        "INSERT INTO surfaces (commit_hash, module, surface_hash, recorded_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (commit_hash, module) DO UPDATE SET surface_hash = excluded.surface_hash, "
+        "recorded_at = excluded.recorded_at",
+        (commit, module_config["module"], surface_hash, now_iso())
+    )
+    surface_id = STATE_DB.execute(
+        "SELECT id FROM surfaces WHERE commit_hash IS ? AND module = ? ORDER BY id DESC LIMIT 1",
+        (commit, module_config["module"])
+    ).fetchone()[0]
+    set_cursor(f"last_surface:{module_config['module']}", str(surface_id))
+
+def get_last_import_profile(import_statement):
+    """Get the last recorded import profile of an import statement, or None"""
+    profile_id = get_cursor(f"last_import_profile:{import_statement}")
+    if profile_id is None:
+        return None
+    row = STATE_DB.execute(
+        "SELECT commit_hash, wall_seconds, peak_rss_kb, modules_hash, error FROM import_profiles WHERE id = ?",
+        (int(profile_id),)
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "commit": row[0],
+        "wall_seconds": row[1],
+        "peak_rss_kb": row[2],
+        "modules": json.loads(load_blob(row[3]) or "{}"),
+        "error": row[4]
+    }
+
+def set_last_import_profile(commit, import_statement, profile):
+    """Record the import profile of an import statement at a commit as its last profile"""
+    STATE_DB.execute(
+        "INSERT INTO import_profiles (commit_hash, import_statement, wall_seconds, peak_rss_kb, modules_hash, "
+        "error, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (commit_hash, import_statement) DO UPDATE SET "
+        "wall_seconds = excluded.wall_seconds, peak_rss_kb = excluded.peak_rss_kb, "
+        "modules_hash = excluded.modules_hash, error = excluded.error, recorded_at = excluded.recorded_at",
+        (
+            commit, import_statement, profile["wall_seconds"], profile["peak_rss_kb"],
+            store_blob(json.dumps(profile["modules"], sort_keys=True)), profile["error"], now_iso()
+        )
+    )
+    profile_id = STATE_DB.execute(
+        "SELECT id FROM import_profiles WHERE commit_hash IS ? AND import_statement = ? ORDER BY id DESC LIMIT 1",
+        (commit, import_statement)
+    ).fetchone()[0]
+    set_cursor(f"last_import_profile:{import_statement}", str(profile_id))
+
+def get_checkpoint(mode, origin):
+    """Get the position of an interrupted scan of a mode, or None
+
+    `origin` identifies the scan, such as its start commit or its commit list, and a
+    checkpoint of another scan is ignored.
+    """
+    value = get_cursor("checkpoint")
+    if value is None:
+        return None
+    checkpoint = json.loads(value)
+    if checkpoint["mode"] != mode or checkpoint["origin"] != origin:
+        return None
+    return checkpoint["position"]
+
+def commit_checkpoint(mode, origin, position):
+    """Commit everything recorded for a finished step of a scan together with its position"""
+    set_cursor("checkpoint", json.dumps({"mode": mode, "origin": origin, "position": position}))
+    commit_state()
+
+def clear_checkpoint():
+    """Forget the position of a finished scan"""
+    STATE_DB.execute("DELETE FROM cursors WHERE name = ?", (cursor_name("checkpoint"),))
+
+def commit_state():
+    """Commit the recorded state, then move the issues queued with it to the outbox"""
+    STATE_DB.commit()
+    spool_notifications()
+
+def start_run():
+    """Record the start of a check cycle and return its run id"""
+    with STATE_DB:
+        return STATE_DB.execute(
+            "INSERT INTO runs (status, started_at) VALUES ('running', ?)", (now_iso(),)
+        ).lastrowid
+
+def finish_run(run_id, mode, error=None):
+    """Record the end of a check cycle"""
+    with STATE_DB:
+        STATE_DB.execute(
+            "UPDATE runs SET mode = ?, status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (mode, "failed" if error else "ok", error, now_iso(), run_id)
+        )
+
+def migrate_config_state(config):
+    """Move the state kept in older configuration files into the state store, once
+
+    The migrated keys are removed from the configuration file afterwards.
+    """
+    state_keys = [key for key in ("last_checked_commit",) if key in config]
+    state_entries = [
+        entry for entry in config["functions_to_monitor"] + config.get("modules_to_monitor", [])
+        if "last_signature" in entry or "last_surface" in entry
+    ]
+    if not state_keys and not state_entries:
+        return
+
+    logger.info("Migrating the state in the configuration file to the state store")
+    with STATE_DB:
+        if config.get("last_checked_commit") and get_cursor("last_checked_commit") is None:
+            set_cursor("last_checked_commit", config["last_checked_commit"])
+        for entry in state_entries:
+            # The commit a migrated signature was taken at is unknown
+            if entry.get("last_signature") and not get_last_signature(entry):
+                set_last_signature(None, entry, entry["last_signature"])
+            if entry.get("last_surface") is not None and get_last_surface(entry) is None:
+                set_last_surface(None, entry, entry["last_surface"])
+
+    for key in state_keys:
+        del config[key]
+    for entry in state_entries:
+        entry.pop("last_signature", None)
+        entry.pop("last_surface", None)
+    save_config(config)
+
+@contextlib.contextmanager
+def timed_stage(stage):
+    """Time a stage of the watch cycle, counting its runs and failures"""
+    metrics = STAGE_METRICS.setdefault(stage, {"count": 0, "seconds": 0.0, "failures": 0})
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        metrics["failures"] += 1
+        raise
+    finally:
+        metrics["count"] += 1
+        metrics["seconds"] += time.perf_counter() - start
+
+def count_failure(stage):
+    """Count a failure of a stage that reports errors without raising"""
+    STAGE_METRICS.setdefault(stage, {"count": 0, "seconds": 0.0, "failures": 0})["failures"] += 1
+
+def reset_metrics():
+    """Clear the stage metrics and counters at the start of a cycle"""
+    STAGE_METRICS.clear()
+    CYCLE_COUNTERS.clear()
+
+def merge_metrics(stage_metrics, counters):
+    """Add the metrics collected in a pool worker to the metrics of this cycle"""
+    for stage, worker_metrics in stage_metrics.items():
+        metrics = STAGE_METRICS.setdefault(stage, {"count": 0, "seconds": 0.0, "failures": 0})
+        for key, value in worker_metrics.items():
+            metrics[key] += value
+    CYCLE_COUNTERS.update(counters)
+
+def write_prometheus_textfile(path, cycle):
+    """Write the metrics of the last cycle in the Prometheus textfile collector format"""
+    lines = [
+        "# HELP aiter_api_watcher_stage_seconds Time spent in each stage during the last cycle.",
+        "# TYPE aiter_api_watcher_stage_seconds gauge",
+    ]
+    lines += [f'aiter_api_watcher_stage_seconds{{stage="{stage}"}} {m["seconds"]:.6f}' for stage, m in sorted(cycle["stages"].items())]
+    lines += [
+        "# HELP aiter_api_watcher_stage_runs Number of times each stage ran during the last cycle.",
+        "# TYPE aiter_api_watcher_stage_runs gauge",
+    ]
+    lines += [f'aiter_api_watcher_stage_runs{{stage="{stage}"}} {m["count"]}' for stage, m in sorted(cycle["stages"].items())]
+    lines += [
+        "# HELP aiter_api_watcher_stage_failures Number of failures of each stage during the last cycle.",
+        "# TYPE aiter_api_watcher_stage_failures gauge",
+    ]
+    lines += [f'aiter_api_watcher_stage_failures{{stage="{stage}"}} {m["failures"]}' for stage, m in sorted(cycle["stages"].items())]
+    lines += [
+        "# HELP aiter_api_watcher_cycle_counter Counts of the last cycle, such as commits checked and bytes fetched.",
+        "# TYPE aiter_api_watcher_cycle_counter gauge",
+    ]
+    lines += [f'aiter_api_watcher_cycle_counter{{name="{name}"}} {value}' for name, value in sorted(cycle["counters"].items())]
+    lines += [
+        "# HELP aiter_api_watcher_cycle_duration_seconds Duration of the last cycle.",
+        "# TYPE aiter_api_watcher_cycle_duration_seconds gauge",
+        f"aiter_api_watcher_cycle_duration_seconds {cycle['duration_seconds']:.6f}",
+        "# HELP aiter_api_watcher_cycle_success Whether the last cycle finished without an error.",
+        "# TYPE aiter_api_watcher_cycle_success gauge",
+        f"aiter_api_watcher_cycle_success {0 if cycle['error'] else 1}",
+        "# HELP aiter_api_watcher_cycle_end_timestamp_seconds Unix time at which the last cycle ended.",
+        "# TYPE aiter_api_watcher_cycle_end_timestamp_seconds gauge",
+        f"aiter_api_watcher_cycle_end_timestamp_seconds {cycle['end_timestamp']:.0f}",
+    ]
+    # The collector may read at any time, so replace the file atomically
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+def report_cycle_metrics(config, run_id, mode, error, duration):
+    """Write the run log line and the Prometheus textfile, and log a summary of the cycle"""
+    cycle = {
+        "run_id": run_id,
+        "target": STATE_NAMESPACE,
+        "mode": mode,
+        "error": error,
+        "end_timestamp": time.time(),
+        "duration_seconds": duration,
+        "stages": {stage: dict(m) for stage, m in STAGE_METRICS.items()},
+        "counters": dict(CYCLE_COUNTERS)
+    }
     try:
+        run_log = os.path.expanduser(config.get("run_log_file", RUN_LOG_FILE))
+        if run_log:
+            with open(run_log, 'a') as f:
+                f.write(json.dumps(cycle) + "\n")
+        textfile = os.path.expanduser(config.get("metrics_textfile", METRICS_TEXTFILE))
+        if textfile:
+            write_prometheus_textfile(textfile, cycle)
+    except OSError as e:
+        logger.warning(f"Could not write cycle metrics: {e}")
+
+    stages = ", ".join(
+        f"{stage} {m['count']}x {m['seconds']:.1f}s" + (f" ({m['failures']} failed)" if m["failures"] else "")
+        for stage, m in sorted(STAGE_METRICS.items(), key=lambda item: -item[1]["seconds"])
+    )
+    counters = ", ".join(f"{name}={value}" for name, value in sorted(CYCLE_COUNTERS.items()))
+    logger.info(
+        f"Cycle summary: mode={mode} status={'failed' if error else 'ok'} duration={duration:.1f}s "
+        f"{counters or 'no counters'}; stages: {stages or 'none'}"
+    )
+
+def resolve_remote_refs(repo_url, refs):
+    """Resolve several refs of a remote with one `git ls-remote`, returning {ref: commit}
+
+    A ref can be a full name, a branch, a tag or HEAD. Refs the remote does not have are left out.
+    """
+    with timed_stage("ls_remote"):
         result = subprocess.run(
-            ["git", "ls-remote", repo_url, "HEAD"],
+            ["git", "ls-remote", repo_url] + sorted(set(refs)),
             capture_output=True,
             text=True,
             check=True
         )
-        commit_hash = result.stdout.split()[0]
+    advertised = {}
+    for line in result.stdout.splitlines():
+        commit_hash, name = line.split("\t", 1)
+        advertised[name] = commit_hash
+
+    resolved = {}
+    for ref in refs:
+        for name in (ref, f"refs/heads/{ref}", f"refs/tags/{ref}"):
+            # Annotated tags are advertised twice, the peeled entry names the commit
+            commit_hash = advertised.get(f"{name}^{{}}") or advertised.get(name)
+            if commit_hash:
+                resolved[ref] = commit_hash
+                break
+    return resolved
+
+def get_latest_commit(repo_url, ref="HEAD"):
+    """Get the latest commit hash from the repository"""
+    try:
+        commit_hash = resolve_remote_refs(repo_url, [ref]).get(ref)
+        if commit_hash is None:
+            logger.error(f"Ref {ref} not found in {repo_url}")
         return commit_hash
     except subprocess.CalledProcessError as e:
         logger.error(f"Failed to get latest commit: {e}")
         return None
 
+def get_github_session():
+    """Get the pooled session used for all GitHub API requests"""
+    global GITHUB_SESSION
+    if GITHUB_SESSION is None:
+        GITHUB_SESSION = requests.Session()
+        GITHUB_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        GITHUB_SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        GITHUB_SESSION.headers.update({
+            "Authorization": f"token {GITHUB_TOKEN}",
+            "Accept": "application/vnd.github.v3+json"
+        })
+    return GITHUB_SESSION
+
+def parse_retry_after(value):
+    """Get the seconds a Retry-After header asks to wait, given as seconds or as an HTTP date, or None"""
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(retry_at.timestamp() - time.time(), 0)
+
+def get_rate_limit_wait(response, attempt):
+    """Get how long to wait before retrying a GitHub request, or None if it should not be retried"""
+    if response is None or response.status_code >= 500:
+        return min(2 ** attempt, 60)
+    if response.status_code in (403, 429):
+        retry_after = parse_retry_after(response.headers["Retry-After"]) if "Retry-After" in response.headers else None
+        if retry_after is not None:
+            return retry_after
+        if response.headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in response.headers:
+            return max(int(response.headers["X-RateLimit-Reset"]) - time.time(), 0) + 1
+        if "rate limit" in response.text.lower():
+            # Secondary rate limits without headers ask for at least a minute
+            return max(60, 2 ** attempt)
+    return None
+
+def github_request(method, path, max_retries=NOTIFICATION_MAX_RETRIES, max_wait=NOTIFICATION_MAX_WAIT,
+                   retry_server_errors=True, **kwargs):
+    """Send a GitHub API request, backing off on rate limits and server errors
+
+    Without `retry_server_errors` a request that may have reached GitHub, one that got
+    a 5xx or lost its connection, is returned to the caller instead of being sent again.
+    """
+    url = f"{GITHUB_API_URL}{path}"
+    response = None
+    for attempt in range(max_retries + 1):
+        try:
+            response = get_github_session().request(method, url, timeout=GITHUB_TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            logger.warning(f"GitHub request {method} {path} failed: {e}")
+            response = None
+
+        if not retry_server_errors and (response is None or response.status_code >= 500):
+            break
+        wait = get_rate_limit_wait(response, attempt)
+        if wait is None or attempt == max_retries:
+            break
+        if wait > max_wait:
+            logger.warning(f"GitHub asks to wait {wait:.0f} seconds, more than the allowed {max_wait} seconds")
+            break
+        logger.info(f"Waiting {wait:.0f} seconds before retrying GitHub request {method} {path}")
+        time.sleep(wait)
+
+    # Stay below the primary rate limit for the next request as well
+    if response is not None and response.headers.get("X-RateLimit-Remaining") == "0":
+        reset_wait = int(response.headers.get("X-RateLimit-Reset", time.time())) - time.time()
+        if 0 < reset_wait <= max_wait:
+            logger.info(f"GitHub rate limit exhausted, waiting {reset_wait:.0f} seconds for the reset")
+            time.sleep(reset_wait + 1)
+    return response
+
 def create_github_issue(title, body):
     """Create a GitHub issue to notify about API changes"""
     if not GITHUB_TOKEN:
         logger.error("GitHub token not set. Cannot create issue.")
         return False
 
-    url = f"https://api.github.com/repos/{NOTIFICATION_REPO}/issues"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
     data = {
         "title": title,
         "body": body
     }
 
-    response = requests.post(url, headers=headers, json=data)
+    # Issues updated after this time include one created by a failed attempt
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - 60))
+    for attempt in range(NOTIFICATION_MAX_RETRIES + 1):
+        with timed_stage("github_post"):
+            response = github_request(
+                "POST", f"/repos/{NOTIFICATION_REPO}/issues", retry_server_errors=False, json=data
+            )
+        if response is not None and response.status_code < 500:
+            break
+        # The failed attempt may still have created the issue, so look for it before sending it again
+        time.sleep(min(2 ** attempt, 60))
+        existing = find_github_issue(title, started_at)
+        if existing is None:
+            logger.warning("Could not check whether a failed attempt created the issue, not sending it again")
+            break
+        if existing:
+            logger.info(f"GitHub issue was created by a failed attempt: {existing}")
+            CYCLE_COUNTERS["issues_created"] += 1
+            return True
+        if attempt < NOTIFICATION_MAX_RETRIES:
+            logger.info(f"Retrying the creation of GitHub issue: {title}")
 
-    if response.status_code == 201:
+    if response is not None and response.status_code == 201:
         logger.info(f"GitHub issue created successfully: {response.json()['html_url']}")
+        CYCLE_COUNTERS["issues_created"] += 1
         return True
     else:
-        logger.error(f"Failed to create GitHub issue: {response.status_code}, {response.text}")
+        count_failure("github_post")
+        error = f"{response.status_code}, {response.text}" if response is not None else "no response"
+        logger.error(f"Failed to create GitHub issue: {error}")
         return False
 
-def get_commit_history(repo_dir, start_commit=None):
+def find_github_issue(title, since):
+    """Get the URL of an issue with this title updated since a time, "" if there is none, or None on failure"""
+    params = {"state": "all", "since": since, "per_page": 100}
+    page = 1
+    while True:
+        response = github_request("GET", f"/repos/{NOTIFICATION_REPO}/issues", params=dict(params, page=page))
+        if response is None or response.status_code != 200:
+            return None
+        issues = response.json()
+        for issue in issues:
+            if issue["title"] == title:
+                return issue["html_url"]
+        if len(issues) < params["per_page"]:
+            return ""
+        page += 1
+
+def get_outbox_dir(config):
+    """Get the directory of the persistent notification outbox"""
+    return os.path.expanduser(config.get("notification_outbox_dir") or NOTIFICATION_OUTBOX_DIR)
+
+def queue_github_issue(config, title, body):
+    """Queue an issue in the transaction of the commit being processed
+
+    The issue reaches the persistent outbox, to be created by flush_notifications, when
+    the transaction is committed by commit_state, so an interrupted commit queues nothing.
+    """
+    # Names sort in queueing order
+    name = f"{time.time_ns():020d}-{hashlib.sha1(title.encode()).hexdigest()[:12]}.json"
+    STATE_DB.execute(
+        "INSERT INTO notifications (name, outbox_dir, repo, title, body) VALUES (?, ?, ?, ?, ?)",
+        (name, get_outbox_dir(config), NOTIFICATION_REPO, title, body)
+    )
+    CYCLE_COUNTERS["issues_queued"] += 1
+    logger.info(f"Queued GitHub issue: {title}")
+
+def spool_notifications():
+    """Move the committed issues from the state store to the outbox
+
+    A file is written before its row is deleted, and writing it again after a crash
+    replaces it under the same name.
+    """
+    rows = STATE_DB.execute("SELECT id, name, outbox_dir, repo, title, body FROM notifications ORDER BY id").fetchall()
+    for notification_id, name, outbox_dir, repo, title, body in rows:
+        os.makedirs(outbox_dir, exist_ok=True)
+        temp_path = os.path.join(outbox_dir, f".{name}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump({"repo": repo, "title": title, "body": body}, f)
+        os.replace(temp_path, os.path.join(outbox_dir, name))
+        with STATE_DB:
+            STATE_DB.execute("DELETE FROM notifications WHERE id = ?", (notification_id,))
+
+def load_known_issue_titles(config):
+    """Get the titles of all issues of the notification repository
+
+    The titles are cached in the outbox, and each run only fetches the issues
+    updated since the previous fetch.
+    """
+    cache_path = os.path.join(get_outbox_dir(config), "known_issue_titles.json")
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        cache = {}
+    repo_cache = cache.get(NOTIFICATION_REPO, {"titles": [], "fetched_at": None})
+    titles = set(repo_cache["titles"])
+
+    fetched_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    params = {"state": "all", "per_page": 100}
+    if repo_cache["fetched_at"]:
+        params["since"] = repo_cache["fetched_at"]
+    page = 1
+    while True:
+        with timed_stage("github_fetch_titles"):
+            response = github_request("GET", f"/repos/{NOTIFICATION_REPO}/issues", params=dict(params, page=page))
+        if response is None or response.status_code != 200:
+            logger.warning("Could not fetch existing issue titles, duplicates are not filtered")
+            return titles
+        issues = response.json()
+        titles.update(issue["title"] for issue in issues)
+        if len(issues) < params["per_page"]:
+            break
+        page += 1
+
+    cache[NOTIFICATION_REPO] = {"titles": sorted(titles), "fetched_at": fetched_at}
+    temp_path = f"{cache_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(temp_path, cache_path)
+    return titles
+
+def build_digest_issue(notifications):
+    """Roll several queued issues into one"""
+    title = f"[{time.strftime('%Y-%m-%d')}] API Change Digest: {len(notifications)} changes"
+    sections = [f"## {n['title']}\n\n{n['body']}" for n in notifications]
+    body = "# API Change Digest\n\n" + "\n\n---\n\n".join(sections)
+    return title, body
+
+def flush_notifications(config):
+    """Create the queued issues in order, skipping titles that already exist
+
+    Issues that cannot be created stay in the outbox and are retried on the next flush.
+    """
+    outbox_dir = get_outbox_dir(config)
+    if not os.path.isdir(outbox_dir):
+        return
+    # Several watch targets may flush the shared outbox at the same time
+    with open(os.path.join(outbox_dir, ".lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        send_outbox(config, outbox_dir)
+
+def send_outbox(config, outbox_dir):
+    """Create the issues queued in the outbox, oldest first"""
+    entries = sorted(
+        name for name in os.listdir(outbox_dir)
+        if name.endswith(".json") and name[0].isdigit()
+    )
+    notifications = []
+    for name in entries:
+        with open(os.path.join(outbox_dir, name), 'r') as f:
+            notification = json.load(f)
+        if notification.get("repo", NOTIFICATION_REPO) == NOTIFICATION_REPO:
+            notifications.append((name, notification))
+    if not notifications:
+        return
+    if not GITHUB_TOKEN:
+        logger.error(f"GitHub token not set. Keeping {len(notifications)} issues in the outbox.")
+        return
+
+    known_titles = load_known_issue_titles(config)
+    pending = []
+    for name, notification in notifications:
+        if notification["title"] in known_titles:
+            logger.info(f"Issue already exists, dropping: {notification['title']}")
+            os.remove(os.path.join(outbox_dir, name))
+        else:
+            pending.append((name, notification))
+            known_titles.add(notification["title"])
+
+    if config.get("notification_digest") and len(pending) > 1:
+        title, body = build_digest_issue([n for _, n in pending])
+        if create_github_issue(title, body):
+            for name, _ in pending:
+                os.remove(os.path.join(outbox_dir, name))
+        return
+
+    for index, (name, notification) in enumerate(pending):
+        if not create_github_issue(notification["title"], notification["body"]):
+            logger.warning(f"Keeping {len(pending) - index} issues in the outbox for the next run")
+            return
+        os.remove(os.path.join(outbox_dir, name))
+
+def iter_nul_fields(stream, chunk_size=1 << 16):
+    """Yield the NUL-delimited fields of a byte stream as they arrive"""
+    buffer = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        *fields, buffer = (buffer + chunk).split(b"\0")
+        for field in fields:
+            yield field.decode("utf-8", errors="replace")
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace")
+
+def load_commit_metadata(repo_dir, log_args):
+    """Stream one `git log` over a range into COMMIT_INDEX, returning the commit hashes in log order
+
+    Every commit record starts with a record separator, followed by NUL-delimited header
+    fields and the NUL-delimited status/path pairs of the changed files.
+    """
+    cmd = ["git", "log", "-z", "--name-status", "--no-renames", f"--format={COMMIT_LOG_FORMAT}"] + log_args
+    process = subprocess.Popen(cmd, cwd=repo_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    commits = []
+
+    def add_record(record):
+        commit, parents, author_name, author_email, date, message = record[:COMMIT_HEADER_FIELDS]
+        changes = record[COMMIT_HEADER_FIELDS:]
+        statuses, paths = changes[0::2], changes[1::2]
+        COMMIT_INDEX[commit] = {
+            "author_name": author_name,
+            "author_email": author_email,
+            "date": date,
+            "message": message,
+            "parents": parents.split(),
+            "paths": paths,
+            "added_or_deleted": [path for status, path in zip(statuses, paths) if status in ("A", "D")]
+        }
+        commits.append(commit)
+
+    record = None
+    for field in iter_nul_fields(process.stdout):
+        if field.startswith("\x1e"):
+            if record is not None:
+                add_record(record)
+            record = [field[1:]]
+        elif record is None:
+            continue
+        elif len(record) < COMMIT_HEADER_FIELDS:
+            record.append(field)
+        else:
+            # The file list of a commit starts on a new line
+            field = field[1:] if field.startswith("\n") else field
+            if field:
+                record.append(field)
+    if record is not None:
+        add_record(record)
+
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+    return commits
+
+def get_commit_history(repo_dir, start_commit=None, end_commit="HEAD"):
     """Get the commit history from the repository"""
     if start_commit:
-        cmd = ["git", "log", "--format=%H", f"{start_commit}..HEAD"]
-    else:
-        cmd = ["git", "log", "--format=%H"]
-
-    result = subprocess.run(cmd, cwd=repo_dir, capture_output=True, text=True, check=True)
-    commits = result.stdout.strip().split('\n')
-    return [c for c in commits if c]  # Filter out empty strings
+        return load_commit_metadata(repo_dir, [f"{start_commit}..{end_commit}"])
+    return load_commit_metadata(repo_dir, [end_commit])
 
 def get_commit_info(repo_dir, commit):
-    """Get commit information (author, date, message)"""
-    cmd = ["git", "show", "-s", "--format=%an|%ae|%ad|%s", commit]
-    result = subprocess.run(cmd, cwd=repo_dir, capture_output=True, text=True, check=True)
-    parts = result.stdout.strip().split('|', 3)
-    if len(parts) == 4:
-        return {
-            "author_name": parts[0],
-            "author_email": parts[1],
-            "date": parts[2],
-            "message": parts[3]
-        }
+    """Get commit information (author, email, ISO date, message, parents, changed paths)"""
+    if commit in COMMIT_INDEX:
+        return COMMIT_INDEX[commit]
+
+    # Abbreviated hashes, as used in commit_list, match a full hash in the index
+    matches = [info for full_hash, info in COMMIT_INDEX.items() if full_hash.startswith(commit)]
+    if len(matches) == 1 and len(commit) >= 7:
+        return matches[0]
+
+    try:
+        loaded = load_commit_metadata(repo_dir, ["-1", commit])
+    except subprocess.CalledProcessError:
+        loaded = []
+    if loaded:
+        if loaded[0].startswith(commit):
+            COMMIT_INDEX[commit] = COMMIT_INDEX[loaded[0]]
+        return COMMIT_INDEX[loaded[0]]
     return {"message": "Commit info not available"}
-def check_function_in_subprocess(temp_dir, import_statement, function_path):
+
+def format_commit_date(commit_info):
+    """Get the YYYY-MM-DD date of a commit for issue titles"""
+    return commit_info.get("date", "Unknown")[:10]
+
+def get_mirror_cache_dir(config):
+    """Get the directory holding the mirror clones"""
+    return os.path.expanduser(config.get("mirror_cache_dir") or MIRROR_CACHE_DIR)
+
+def get_cache_repo_name(repo_url):
+    """Get the directory name of a cached bare clone, unique per repository URL"""
+    repo_name = repo_url.rstrip("/").split("/")[-1]
+    if repo_name.endswith(".git"):
+        repo_name = repo_name[:-len(".git")]
+    url_hash = hashlib.sha1(repo_url.encode()).hexdigest()[:12]
+    return f"{repo_name}-{url_hash}.git"
+
+def get_mirror_dir(config):
+    """Get the mirror clone path for the configured repository"""
+    return os.path.join(get_mirror_cache_dir(config), get_cache_repo_name(config["repository_url"]))
+
+def get_submodule_cache_dir(config):
+    """Get the directory holding the submodule reference clones"""
+    # A subdirectory, so the mirror cache pruning never removes a clone other checkouts borrow objects from
+    return os.path.expanduser(config.get("submodule_cache_dir") or os.path.join(get_mirror_cache_dir(config), "submodules"))
+
+def get_directory_size(path):
+    """Get the total size in bytes of all files below a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def remove_mirror(path, reason):
+    """Remove a mirror clone unless another process fetches or uses it, returning whether it was removed"""
+    with open(f"{path}.lock", 'w') as lock_file, open(f"{path}.use", 'w') as use_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(use_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(f"Not pruning mirror clone {path}, another process is using it")
+            return False
+        logger.info(f"Pruning mirror clone {path} {reason}")
+        shutil.rmtree(path, ignore_errors=True)
+    return True
+
+@contextlib.contextmanager
+def use_mirror(config):
+    """Hold a shared lock on the mirror clone for a check cycle, so other processes do not prune it
+
+    Fetches take the separate `.lock`, so targets of the same repository still check in parallel.
+    """
+    mirror_dir = get_mirror_dir(config)
+    os.makedirs(os.path.dirname(mirror_dir), exist_ok=True)
+    with open(f"{mirror_dir}.use", 'w') as use_file:
+        fcntl.flock(use_file, fcntl.LOCK_SH)
+        yield mirror_dir
+
+def prune_mirror_cache(config, keep_dir=None):
+    """Remove mirror clones that are too old or exceed the cache size limit"""
+    cache_dir = get_mirror_cache_dir(config)
+    if not os.path.isdir(cache_dir):
+        return
+
+    max_age = config.get("mirror_cache_max_age_days", MIRROR_CACHE_MAX_AGE_DAYS) * 86400
+    max_size = config.get("mirror_cache_max_size_gb", MIRROR_CACHE_MAX_SIZE_GB) * 1024 ** 3
+    now = time.time()
+
+    # Collect the mirrors with their last use time, least recently used first
+    mirrors = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and name.endswith(".git"):
+            mirrors.append((os.path.getmtime(path), path))
+    mirrors.sort()
+
+    remaining = []
+    for last_used, path in mirrors:
+        if path != keep_dir and now - last_used > max_age:
+            if remove_mirror(path, f"(unused for {int((now - last_used) / 86400)} days)"):
+                continue
+        remaining.append((path, get_directory_size(path)))
+
+    total_size = sum(size for _, size in remaining)
+    for path, size in remaining:
+        if total_size <= max_size:
+            break
+        if path == keep_dir:
+            continue
+        if remove_mirror(path, f"to keep the cache below {max_size / 1024 ** 3:.1f} GB"):
+            total_size -= size
+
+    if total_size > max_size:
+        logger.warning(f"Mirror cache uses {total_size / 1024 ** 3:.1f} GB, above the configured limit")
+
+def update_mirror(config):
+    """Create or fetch-update the long-lived bare mirror clone of the repository"""
+    repo_url = config["repository_url"]
+    mirror_dir = get_mirror_dir(config)
+    os.makedirs(os.path.dirname(mirror_dir), exist_ok=True)
+    # Watch targets of the same repository are checked in parallel processes
+    with open(f"{mirror_dir}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        fetch_mirror(config, repo_url, mirror_dir)
+    return mirror_dir
+
+def fetch_mirror(config, repo_url, mirror_dir):
+    """Clone the mirror if it does not exist yet, then fetch all branches and tags"""
+    if not os.path.exists(os.path.join(mirror_dir, "HEAD")):
+        logger.info(f"Creating mirror clone of {repo_url} in {mirror_dir}")
+        # Clone next to the final location so an interrupted clone is never mistaken for a mirror
+        partial_dir = mirror_dir + ".partial"
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        os.makedirs(os.path.dirname(mirror_dir), exist_ok=True)
+        with timed_stage("mirror_clone"):
+            subprocess.run(["git", "clone", "--bare", repo_url, partial_dir], check=True)
+        subprocess.run(["git", "config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"], cwd=partial_dir, check=True)
+        CYCLE_COUNTERS["bytes_fetched"] += get_directory_size(partial_dir)
+        os.rename(partial_dir, mirror_dir)
+    else:
+        logger.info(f"Updating mirror clone {mirror_dir}")
+
+    size_before = get_directory_size(mirror_dir)
+    with timed_stage("mirror_fetch"):
+        subprocess.run(["git", "fetch", "--prune", "--tags", "origin"], cwd=mirror_dir, check=True)
+    CYCLE_COUNTERS["bytes_fetched"] += max(get_directory_size(mirror_dir) - size_before, 0)
+    subprocess.run(["git", "worktree", "prune"], cwd=mirror_dir, check=False)
+
+    # The mirror directory mtime records the last use for the age based pruning
+    os.utime(mirror_dir)
+    prune_mirror_cache(config, keep_dir=mirror_dir)
+
+def commit_exists(repo_dir, commit):
+    """Check whether a repository has a commit object"""
+    result = subprocess.run(
+        ["git", "cat-file", "-e", f"{commit}^{{commit}}"],
+        cwd=repo_dir,
+        capture_output=True
+    )
+    return result.returncode == 0
+
+def ensure_commit_in_mirror(mirror_dir, commit):
+    """Fetch a commit that is not reachable from any branch or tag of the mirror"""
+    if not commit_exists(mirror_dir, commit):
+        logger.info(f"Fetching commit {commit} into mirror clone")
+        subprocess.run(["git", "fetch", "origin", commit], cwd=mirror_dir, check=True)
+
+@contextlib.contextmanager
+def commit_worktree(mirror_dir, commit):
+    """Check out a commit of the mirror clone into a temporary worktree"""
+    ensure_commit_in_mirror(mirror_dir, commit)
+    worktree_dir = tempfile.mkdtemp(prefix="aiter_worktree_")
+    try:
+        logger.info(f"Checking out commit {commit}")
+        with timed_stage("checkout"):
+            subprocess.run(["git", "worktree", "add", "--detach", "--force", worktree_dir, commit], cwd=mirror_dir, check=True)
+        yield worktree_dir
+    finally:
+        # `git worktree remove` refuses worktrees with submodules, so delete and prune instead
+        shutil.rmtree(worktree_dir, ignore_errors=True)
+        subprocess.run(["git", "worktree", "prune"], cwd=mirror_dir, check=False)
+
+def check_function_in_subprocess(temp_dir, import_statement, function_path, timeout=INSPECTION_TIMEOUT):
     """Run function check in a separate process to ensure clean environment"""
     # Extract the function name from the path
     function_name = function_path.split('.')[-1]
@@ -202,14 +1291,18 @@ print("JSON_RESULT_END")
 
     # Run the script in a separate process
     try:
-        result = subprocess.run(
-            [sys.executable, script_path],
-            capture_output=True,
-            text=True,
-            check=False  # Don't raise an exception on non-zero exit code
-        )
+        with timed_stage("inspection"):
+            result = subprocess.run(
+                [sys.executable, script_path],
+                capture_output=True,
+                text=True,
+                check=False,  # Don't raise an exception on non-zero exit code
+                timeout=timeout
+            )
+        CYCLE_COUNTERS["functions_inspected"] += 1
 
         if result.returncode != 0:
+            count_failure("inspection")
             return {
                 "exists": False,
                 "signature": None,
@@ -251,6 +1344,15 @@ print("JSON_RESULT_END")
                 "source": None,
                 "error": f"Failed to parse JSON output: {str(e)}\nOutput: {stdout}"
             }
+    except subprocess.TimeoutExpired:
+        count_failure("inspection")
+        return {
+            "exists": False,
+            "signature": None,
+            "parameters": None,
+            "source": None,
+            "error": f"Inspection timed out after {timeout} seconds"
+        }
     except Exception as e:
         return {
             "exists": False,
@@ -261,372 +1363,3203 @@ print("JSON_RESULT_END")
         }
 
 
-def compare_parameters(prev_params, curr_params):
-    """Compare function parameters and return detailed changes"""
-    if prev_params is None or curr_params is None:
-        return "Cannot compare parameters (one or both are missing)"
+BATCH_INSPECT_SCRIPT = r'''
+import os
+import sys
+import json
+import signal
+import inspect
+import traceback
 
-    changes = []
+with open(sys.argv[1]) as f:
+    spec = json.load(f)
 
-    # Find removed parameters
-    prev_param_names = {p["name"] for p in prev_params}
-    curr_param_names = {p["name"] for p in curr_params}
+sys.path.insert(0, spec["repo_dir"])
+timeout = spec["timeout"]
 
-    removed = prev_param_names - curr_param_names
-    if removed:
-        changes.append(f"Removed parameters: {', '.join(removed)}")
 
-    # Find added parameters
-    added = curr_param_names - prev_param_names
-    if added:
-        changes.append(f"Added parameters: {', '.join(added)}")
+class InspectionTimeout(Exception):
+    pass
 
-    # Check for changes in existing parameters
-    for prev_param in prev_params:
-        name = prev_param["name"]
-        if name in curr_param_names:
-            curr_param = next(p for p in curr_params if p["name"] == name)
 
-            # Check for changes in parameter properties
-            param_changes = []
+def on_timeout(signum, frame):
+    raise InspectionTimeout(f"Timed out after {timeout} seconds")
 
-            if prev_param["kind"] != curr_param["kind"]:
-                param_changes.append(f"kind changed from {prev_param['kind']} to {curr_param['kind']}")
 
-            if prev_param["default"] != curr_param["default"]:
-                param_changes.append(f"default value changed from {prev_param['default']} to {curr_param['default']}")
+signal.signal(signal.SIGALRM, on_timeout)
 
-            if prev_param["annotation"] != curr_param["annotation"]:
-                param_changes.append(f"type annotation changed from {prev_param['annotation']} to {curr_param['annotation']}")
+# Stub modules stand in for compiled extensions and GPU-only dependencies
+stubbed_modules = []
+if spec.get("stubs"):
+    import types
+    import fnmatch
+    import importlib.abc
+    import importlib.machinery
 
-            if param_changes:
-                changes.append(f"Parameter '{name}' changed: {'; '.join(param_changes)}")
+    class StubBase:
+        pass
 
-    # Check for reordering of parameters
-    prev_ordered_names = [p["name"] for p in prev_params if p["name"] in curr_param_names]
-    curr_ordered_names = [p["name"] for p in curr_params if p["name"] in prev_param_names]
+    class Stub:
+        """Any attribute, call or item of a stubbed module, named after the expression it stands for"""
 
-    if prev_ordered_names != curr_ordered_names:
-        changes.append(f"Parameter order changed: {' -> '.join([', '.join(prev_ordered_names), ', '.join(curr_ordered_names)])}")
+        def __init__(self, name):
+            object.__setattr__(self, "_stub_name", name)
 
-    return changes if changes else ["No parameter changes detected"]
+        def __getattr__(self, attr):
+            if attr.startswith("__") and attr.endswith("__"):
+                raise AttributeError(attr)
+            return Stub(f"{self._stub_name}.{attr}")
 
-def compare_two_commits(config, old_commit, new_commit):
-    """Compare two specific commits"""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        subprocess.run(["git", "clone", config["repository_url"], temp_dir], check=True)
-
-        # Checkout old commit
-        subprocess.run(["git", "checkout", old_commit], cwd=temp_dir, check=True)
-        subprocess.run(["git", "submodule", "update", "--init", "--recursive"], cwd=temp_dir, check=True)
-        subprocess.run([sys.executable, "setup.py", "develop"], cwd=temp_dir, check=True)
-
-        old_signatures = {}
-        for func_config in config["functions_to_monitor"]:
-            old_signatures[func_config["function_path"]] = check_function_in_subprocess(
-                temp_dir, func_config["import_statement"], func_config["function_path"]
-            )
+        def __call__(self, *args, **kwargs):
+            # Decorators and decorator factories from stubbed modules keep the decorated object
+            if len(args) == 1 and not kwargs and (inspect.isroutine(args[0]) or inspect.isclass(args[0])):
+                return args[0]
+            return Stub(f"{self._stub_name}()")
 
-        # Checkout new commit
-        subprocess.run(["git", "checkout", new_commit], cwd=temp_dir, check=True)
-        subprocess.run(["git", "submodule", "update", "--init", "--recursive"], cwd=temp_dir, check=True)
-        subprocess.run([sys.executable, "setup.py", "develop"], cwd=temp_dir, check=True)
+        def __getitem__(self, key):
+            return Stub(f"{self._stub_name}[{key!r}]")
 
-        for func_config in config["functions_to_monitor"]:
-            new_signature = check_function_in_subprocess(
-                temp_dir, func_config["import_statement"], func_config["function_path"]
-            )
+        def __mro_entries__(self, bases):
+            return (StubBase,)
 
-            old_signature = old_signatures.get(func_config["function_path"], {})
+        # Signatures show stubbed annotations and defaults the way the real objects print
+        def __repr__(self):
+            return self._stub_name
 
-            if (old_signature.get("exists") != new_signature.get("exists") or
-                old_signature.get("signature") != new_signature.get("signature")):
+        def __str__(self):
+            return f"<class '{self._stub_name}'>"
 
-                param_changes = compare_parameters(
-                    old_signature.get("parameters"),
-                    new_signature.get("parameters")
-                )
-                commit_info = get_commit_info(temp_dir, new_commit)
-                commit_date = commit_info.get("date", "Unknown").split()[0]  # Only keep YYYY-MM-DD
-                short_commit = new_commit[:7]
-                title = f"[{commit_date} {short_commit}] API Change Detected (Compare Mode): {func_config['function_path']}"
-                body = f"""## API Change Detected (Compare Mode)
+        def __fspath__(self):
+            return self._stub_name
 
-Function: `{func_config['function_path']}`
-Import: `{func_config['import_statement']}`
-Old Commit: {old_commit}
-New Commit: {new_commit}
+        def __bool__(self):
+            return False
 
-### Old Signature
-{old_signature.get('signature', 'N/A')}
+        def __iter__(self):
+            return iter(())
 
-### New Signature
-{new_signature.get('signature', 'N/A')}
+        def __len__(self):
+            return 0
 
-### Parameter Changes
-{chr(10).join(f"- {change}" for change in param_changes)}
+        def __int__(self):
+            return 0
 
-### Error (if any)
-```
-{new_signature.get('error', 'No error')}
-```
-"""
-                create_github_issue(title, body)
-            else:
-                logger.info(f"No API change for {func_config['function_path']} between {old_commit} and {new_commit}")
+        __index__ = __int__
 
+        def __float__(self):
+            return 0.0
 
-def process_commit_list(config):
-    """Process a list of commits in order"""
-    commit_list = config["commit_list"]
+        def __contains__(self, item):
+            return False
 
-    if not commit_list:
-        logger.info("No commits specified in commit_list")
-        return
+        def __enter__(self):
+            return self
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        subprocess.run(["git", "clone", config["repository_url"], temp_dir], check=True)
+        def __exit__(self, *exc_info):
+            return False
 
-        # Process commits in order
-        for commit in commit_list:
-            logger.info(f"Processing commit {commit}")
-            try:
-                subprocess.run(["git", "checkout", commit], cwd=temp_dir, check=True)
-                subprocess.run(["git", "submodule", "update", "--init", "--recursive"], cwd=temp_dir, check=True)
-                subprocess.run([sys.executable, "setup.py", "develop"], cwd=temp_dir, check=True)
+        def __or__(self, other):
+            return self
 
-                commit_info = get_commit_info(temp_dir, commit)
-                commit_date = commit_info.get("date", "Unknown").split()[0]
-                short_commit = commit[:7]
+        __ror__ = __add__ = __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = __truediv__ = __or__
 
-                for func_config in config["functions_to_monitor"]:
-                    import_statement = func_config["import_statement"]
-                    function_path = func_config["function_path"]
+    class StubModule(types.ModuleType):
+        def __getattr__(self, attr):
+            if attr.startswith("__") and attr.endswith("__"):
+                raise AttributeError(attr)
+            return Stub(f"{self.__name__}.{attr}")
 
-                    current_signature = check_function_in_subprocess(
-                        temp_dir, import_statement, function_path
-                    )
+    local_packages = {
+        name[:-len(".py")] if name.endswith(".py") else name
+        for name in os.listdir(spec["repo_dir"])
+        if name.endswith(".py") or os.path.isdir(os.path.join(spec["repo_dir"], name))
+    }
 
-                    previous_signature = func_config.get("last_signature", {})
+    class StubFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+        """Stub configured modules, compiled extensions of the repository and, last, missing dependencies"""
 
-                    if not previous_signature:
-                        func_config["last_signature"] = current_signature
-                        logger.info(f"Initial signature for {function_path}: {current_signature.get('signature', 'Not available')}")
-                    elif (previous_signature.get("exists") != current_signature["exists"] or
-                          previous_signature.get("signature") != current_signature["signature"]):
+        def __init__(self, last):
+            self.last = last
 
-                        param_changes = compare_parameters(
-                            previous_signature.get("parameters"),
-                            current_signature.get("parameters")
-                        )
+        def should_stub(self, name, path):
+            parent = sys.modules.get(name.rpartition(".")[0])
+            if isinstance(parent, StubModule):
+                return True
+            if self.last:
+                # Only reached when no other finder found the module
+                return spec["stubs"]["missing"] and name.partition(".")[0] not in local_packages
+            if any(fnmatch.fnmatchcase(name, pattern) for pattern in spec["stubs"]["patterns"]):
+                return True
+            if name.partition(".")[0] in local_packages:
+                found = importlib.machinery.PathFinder.find_spec(name, path)
+                return found is not None and isinstance(found.loader, importlib.machinery.ExtensionFileLoader)
+            return False
 
-                        title = f"[{commit_date} {short_commit}] API Change Detected: {function_path}"
-                        body = f"""## API Change Detected
+        def find_spec(self, name, path, target=None):
+            if self.should_stub(name, path):
+                return importlib.machinery.ModuleSpec(name, self, is_package=True)
+            return None
 
-Function: `{function_path}`
-Import: `{import_statement}`
-Commit: {commit}
+        def create_module(self, module_spec):
+            return StubModule(module_spec.name)
 
-### Previous State
-{previous_signature.get('signature', 'N/A')}
+        def exec_module(self, module):
+            module.__path__ = []
+            module.__version__ = "0.0.0"
+            stubbed_modules.append(module.__name__)
 
-### Current State
-{current_signature.get('signature', 'N/A')}
+    sys.meta_path.insert(0, StubFinder(last=False))
+    sys.meta_path.append(StubFinder(last=True))
 
-### Parameter Changes
-{chr(10).join(f"- {change}" for change in param_changes)}
 
-### Error (if any)
-```
-{current_signature.get('error', 'No error')}
-```
-"""
-                        create_github_issue(title, body)
+def describe(function):
+    result = {"exists": True, "signature": None, "parameters": None, "source": None, "error": None}
+    signature = inspect.signature(function)
+    result["signature"] = str(signature)
+    result["parameters"] = [
+        {
+            "name": name,
+            "kind": str(param.kind),
+            "default": "NO_DEFAULT" if param.default is inspect.Parameter.empty else repr(param.default),
+            "annotation": "NO_ANNOTATION" if param.annotation is inspect.Parameter.empty else str(param.annotation)
+        }
+        for name, param in signature.parameters.items()
+    ]
+    try:
+        result["source"] = inspect.getsource(function)
+    except (TypeError, OSError):
+        result["source"] = "Source code not available"
+    return result
 
-                        func_config["last_signature"] = current_signature
-                        logger.info(f"API change detected for {function_path}")
-                    else:
-                        logger.info(f"No API change for {function_path}")
 
-            except Exception as e:
-                logger.error(f"Error processing commit {commit}: {e}")
-                logger.error(traceback.format_exc())
+# Each distinct import statement runs once, into its own namespace
+namespaces = {}
+import_errors = {}
+results = {}
+for func in spec["functions"]:
+    import_statement = func["import_statement"]
+    if import_statement not in namespaces and import_statement not in import_errors:
+        namespace = {}
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            exec(import_statement, namespace)
+            namespaces[import_statement] = namespace
+        except BaseException as e:
+            import_errors[import_statement] = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
 
-        # After processing, clear commit_list and continue normal monitoring
-        config["commit_list"] = []
-        save_config(config)
-        logger.info("Finished processing commit list. Resuming normal monitoring.")
+    if import_statement in import_errors:
+        results[func["function_path"]] = {
+            "exists": False, "signature": None, "parameters": None, "source": None,
+            "error": import_errors[import_statement]
+        }
+        continue
 
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        results[func["function_path"]] = describe(eval(func["function_path"], namespaces[import_statement]))
+    except BaseException as e:
+        results[func["function_path"]] = {
+            "exists": False, "signature": None, "parameters": None, "source": None,
+            "error": f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+        }
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
 
-def check_api_changes(config):
-    """Check for API changes in the monitored functions"""
+if spec.get("stubs"):
+    for result in results.values():
+        result["stubbed_modules"] = sorted(set(stubbed_modules))
 
-    # Mode 3: Compare two specific commits
-    if config.get("compare_pair"):
-        old_commit, new_commit = config["compare_pair"]
-        logger.info(f"Comparing two commits: {old_commit} -> {new_commit}")
-        compare_two_commits(config, old_commit, new_commit)
-        return 3
+print("JSON_RESULT_START")
+print(json.dumps(results))
+print("JSON_RESULT_END")
+'''
 
-    # Mode 2: Process a list of commits
-    if config.get("commit_list"):
-        logger.info(f"Processing specified commit list: {config['commit_list']}")
-        process_commit_list(config)
-        return 2
+INSPECTION_SERVER_SCRIPT = r'''
+import os
+import sys
+import json
+import time
+import signal
+import importlib
+import traceback
 
-    # Default Mode 1: Monitor latest commits
-    latest_commit = get_latest_commit(config["repository_url"])
+# Import the heavy dependencies once, every forked child starts with them loaded
+preloaded, failed = [], {}
+for module in json.loads(sys.argv[1]):
+    try:
+        importlib.import_module(module)
+        preloaded.append(module)
+    except BaseException as e:
+        failed[module] = f"{type(e).__name__}: {e}"
 
-    if not latest_commit:
-        logger.error("Failed to get latest commit")
-        return
+with open(sys.argv[2]) as f:
+    batch_code = compile(f.read(), sys.argv[2], "exec")
 
-    # If we've already checked this commit, skip
-    if config["last_checked_commit"] == latest_commit:
-        logger.info(f"No new commits since last check ({latest_commit})")
+print(json.dumps({"ready": True, "preloaded": preloaded, "failed": failed}), flush=True)
+
+
+def run_child(request):
+    os.setsid()
+    # The request pipe belongs to the server
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    for fd, path in ((1, request["stdout_path"]), (2, request["stderr_path"])):
+        output = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(output, fd)
+        os.close(output)
+    code = 0
+    try:
+        sys.argv = [sys.argv[2], request["spec_path"]]
+        exec(batch_code, {"__name__": "__main__"})
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+
+for line in sys.stdin:
+    request = json.loads(line)
+    pid = os.fork()
+    if pid == 0:
+        run_child(request)
+
+    deadline = time.monotonic() + request["timeout"]
+    timed_out = False
+    while True:
+        waited, status = os.waitpid(pid, os.WNOHANG)
+        if waited:
+            break
+        if time.monotonic() > deadline:
+            timed_out = True
+            # The child leads its own process group, which also covers its subprocesses
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                os.kill(pid, signal.SIGKILL)
+            _, status = os.waitpid(pid, 0)
+            break
+        time.sleep(0.01)
+
+    print(json.dumps({"timed_out": timed_out, "returncode": os.waitstatus_to_exitcode(status)}), flush=True)
+'''
+
+class InspectionServerError(Exception):
+    """The inspection server could not be started or stopped answering"""
+
+class InspectionServer:
+    """A warm interpreter with pre-imported dependencies that forks one child per batch inspection
+
+    Only third-party modules are pre-imported, the monitored package is always imported in the
+    forked child, so every inspection sees only its own checkout.
+    """
+
+    def __init__(self, preload_modules):
+        self.work_dir = tempfile.mkdtemp(prefix="aiter_inspection_server_")
+        script_path = os.path.join(self.work_dir, "inspection_server.py")
+        batch_script_path = os.path.join(self.work_dir, "check_functions.py")
+        with open(script_path, 'w') as f:
+            f.write(INSPECTION_SERVER_SCRIPT)
+        with open(batch_script_path, 'w') as f:
+            f.write(BATCH_INSPECT_SCRIPT)
+        self.requests = 0
+        self.process = subprocess.Popen(
+            [sys.executable, script_path, json.dumps(preload_modules), batch_script_path],
+            cwd=self.work_dir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        ready = self.read_reply()
+        if not ready.get("ready"):
+            self.close()
+            raise InspectionServerError(f"Unexpected reply from the inspection server: {ready}")
+        logger.info(f"Inspection server started, pre-imported: {', '.join(ready['preloaded']) or 'nothing'}")
+        for module, error in ready["failed"].items():
+            logger.info(f"Inspection server could not pre-import {module}: {error}")
+
+    def read_reply(self):
+        line = self.process.stdout.readline()
+        if not line:
+            raise InspectionServerError(f"Inspection server exited with code {self.process.poll()}")
+        return json.loads(line)
+
+    def inspect(self, spec_path, timeout):
+        """Run the batch inspection of a spec file in a forked child, returning (stdout, stderr, returncode)"""
+        self.requests += 1
+        stdout_path = os.path.join(self.work_dir, f"inspection-{self.requests}.out")
+        stderr_path = os.path.join(self.work_dir, f"inspection-{self.requests}.err")
+        try:
+            self.process.stdin.write(json.dumps({
+                "spec_path": spec_path,
+                "stdout_path": stdout_path,
+                "stderr_path": stderr_path,
+                "timeout": timeout
+            }) + "\n")
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise InspectionServerError("Inspection server exited")
+        reply = self.read_reply()
+        try:
+            with open(stdout_path, 'r') as f:
+                stdout = f.read()
+            with open(stderr_path, 'r') as f:
+                stderr = f.read()
+        finally:
+            for path in (stdout_path, stderr_path):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+        if reply["timed_out"]:
+            raise subprocess.TimeoutExpired(spec_path, timeout, stdout, stderr)
+        return stdout, stderr, reply["returncode"]
+
+    def close(self):
+        with contextlib.suppress(OSError):
+            self.process.stdin.close()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+def get_inspection_server(preload_modules):
+    """Get the inspection server of this process, starting it on first use, or None if it cannot start"""
+    global INSPECTION_SERVER
+    if INSPECTION_SERVER is None:
+        try:
+            with timed_stage("inspection_server_start"):
+                INSPECTION_SERVER = InspectionServer(preload_modules)
+            atexit.register(stop_inspection_server)
+        except (InspectionServerError, OSError) as e:
+            logger.warning(f"Could not start the inspection server, using subprocesses: {e}")
+            # Do not retry before the next cycle
+            INSPECTION_SERVER = False
+    return INSPECTION_SERVER or None
+
+def stop_inspection_server():
+    """Stop the inspection server of this process, if one is running"""
+    global INSPECTION_SERVER
+    if INSPECTION_SERVER:
+        INSPECTION_SERVER.close()
+    INSPECTION_SERVER = None
+
+def run_batch_inspection(script_path, spec_path, timeout, preload_modules=None):
+    """Run the batch inspection script, returning (stdout, stderr, returncode)
+
+    With `preload_modules` the script runs in a child forked from the warm inspection
+    server. If the server is unavailable the script runs in a new interpreter.
+    """
+    if preload_modules is not None:
+        server = get_inspection_server(preload_modules)
+        if server is not None:
+            try:
+                return server.inspect(spec_path, timeout)
+            except InspectionServerError as e:
+                logger.warning(f"Inspection server failed, using a subprocess instead: {e}")
+                stop_inspection_server()
+
+    result = subprocess.run(
+        [sys.executable, script_path, spec_path],
+        capture_output=True,
+        text=True,
+        check=False,
+        timeout=timeout
+    )
+    return result.stdout, result.stderr, result.returncode
+
+def check_functions_in_subprocess(temp_dir, functions, timeout=INSPECTION_TIMEOUT, preload_modules=None, stubs=None):
+    """Inspect several functions in one separate process
+
+    Each distinct import statement is executed once, and the result dicts are
+    returned keyed by function_path. A failing import or lookup only affects the
+    functions that depend on it. Functions missing from the batch output (for example
+    after a crash of the interpreter) are re-checked one by one. With `preload_modules`
+    the process is forked from the warm inspection server. With `stubs` an import hook
+    replaces compiled extensions and unavailable dependencies by stub modules.
+    """
+    spec_path = os.path.join(temp_dir, "check_functions.json")
+    script_path = os.path.join(temp_dir, "check_functions.py")
+    with open(spec_path, 'w') as f:
+        json.dump({
+            "repo_dir": temp_dir,
+            "timeout": timeout,
+            "stubs": stubs,
+            "functions": [
+                {"import_statement": func["import_statement"], "function_path": func["function_path"]}
+                for func in functions
+            ]
+        }, f)
+    with open(script_path, 'w') as f:
+        f.write(BATCH_INSPECT_SCRIPT)
+
+    results = {}
+    timed_out = False
+    # Every import and every lookup has its own alarm, this only guards against a hung interpreter
+    distinct_imports = len({func["import_statement"] for func in functions})
+    batch_timeout = timeout * (len(functions) + distinct_imports)
+    try:
+        with timed_stage("inspection"):
+            stdout, stderr, returncode = run_batch_inspection(script_path, spec_path, batch_timeout, preload_modules)
+        CYCLE_COUNTERS["functions_inspected"] += len(functions)
+        start_idx = stdout.find("JSON_RESULT_START")
+        end_idx = stdout.find("JSON_RESULT_END")
+        if start_idx != -1 and end_idx != -1:
+            results = json.loads(stdout[start_idx + len("JSON_RESULT_START"):end_idx].strip())
+        else:
+            count_failure("inspection")
+            logger.error(f"Batch inspection exited with code {returncode} without results")
+            logger.debug(f"Batch inspection stderr: {stderr}")
+    except subprocess.TimeoutExpired:
+        count_failure("inspection")
+        logger.error(f"Batch inspection timed out after {batch_timeout} seconds")
+        timed_out = True
+    except json.JSONDecodeError as e:
+        logger.error(f"Error parsing batch inspection output: {e}")
+
+    for func in functions:
+        if func["function_path"] in results:
+            continue
+        if timed_out:
+            # The import ignored its alarm, so a check of its own would hang as well
+            results[func["function_path"]] = {
+                "exists": False,
+                "signature": None,
+                "parameters": None,
+                "source": None,
+                "error": f"Batch inspection timed out after {batch_timeout} seconds"
+            }
+        elif stubs and len(functions) > 1:
+            # Without the stubs the import would fail where no build exists
+            results.update(check_functions_in_subprocess(temp_dir, [func], timeout, preload_modules, stubs))
+        else:
+            results[func["function_path"]] = check_function_in_subprocess(
+                temp_dir, func["import_statement"], func["function_path"], timeout
+            )
+    return results
+
+
+IMPORT_PROFILE_SCRIPT = r'''
+import sys
+import time
+import json
+import resource
+
+sys.path.insert(0, sys.argv[1])
+# Everything -X importtime prints after the marker belongs to the profiled import
+print("IMPORT_PROFILE_START", file=sys.stderr, flush=True)
+start = time.perf_counter()
+error = None
+try:
+    exec(sys.argv[2], {})
+except BaseException as e:
+    error = f"{type(e).__name__}: {e}"
+wall_seconds = time.perf_counter() - start
+
+print("JSON_RESULT_START")
+print(json.dumps({
+    "wall_seconds": wall_seconds,
+    # ru_maxrss is in kilobytes on Linux
+    "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "error": error
+}))
+print("JSON_RESULT_END")
+'''
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output after the profile marker into {module: [self_us, cumulative_us]}"""
+    modules = {}
+    started = False
+    for line in stderr.splitlines():
+        if line == "IMPORT_PROFILE_START":
+            started = True
+            continue
+        if not started or not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules[fields[2].strip()] = [int(fields[0]), int(fields[1])]
+    return modules
+
+def profile_import(checkout_dir, import_statement, repeats=IMPORT_PROFILE_REPEATS, timeout=INSPECTION_TIMEOUT):
+    """Measure the import time, per-module costs and peak RSS of an import statement in fresh interpreters
+
+    The fastest of `repeats` runs is kept, to keep scheduling noise out of the comparison.
+    """
+    script_path = os.path.join(checkout_dir, "profile_import.py")
+    with open(script_path, 'w') as f:
+        f.write(IMPORT_PROFILE_SCRIPT)
+    best = None
+    for _ in range(max(repeats, 1)):
+        try:
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", script_path, checkout_dir, import_statement],
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return {"wall_seconds": None, "peak_rss_kb": None, "modules": {}, "error": f"Timed out after {timeout} seconds"}
+        start_idx = result.stdout.find("JSON_RESULT_START")
+        end_idx = result.stdout.find("JSON_RESULT_END")
+        if start_idx == -1 or end_idx == -1:
+            return {"wall_seconds": None, "peak_rss_kb": None, "modules": {}, "error": f"Profile exited with code {result.returncode}"}
+        profile = json.loads(result.stdout[start_idx + len("JSON_RESULT_START"):end_idx].strip())
+        profile["modules"] = parse_importtime(result.stderr)
+        if best is None or profile["wall_seconds"] < best["wall_seconds"]:
+            best = profile
+    return best
+
+def profile_imports(config, checkout_dir, functions):
+    """Profile every distinct import statement of the functions, returning {import_statement: profile}"""
+    profiles = {}
+    with timed_stage("import_profile"):
+        for import_statement in dict.fromkeys(func["import_statement"] for func in functions):
+            profiles[import_statement] = profile_import(
+                checkout_dir, import_statement,
+                config.get("import_profile_repeats", IMPORT_PROFILE_REPEATS),
+                config.get("inspection_timeout_seconds", INSPECTION_TIMEOUT)
+            )
+            CYCLE_COUNTERS["imports_profiled"] += 1
+            logger.info(
+                f"Import profile of `{import_statement}`: {profiles[import_statement]['wall_seconds'] or 0:.2f}s, "
+                f"peak RSS {(profiles[import_statement]['peak_rss_kb'] or 0) / 1024:.0f} MB"
+            )
+    return profiles
+
+
+class GitSourceReader:
+    """Read the files of a commit straight from the mirror clone, without a checkout"""
+
+    def __init__(self, mirror_dir, commit):
+        self.commit = commit
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=mirror_dir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+        self.cache = {}
+
+    def read(self, path):
+        """Return the text of a file at the commit, or None if it is not a file there"""
+        if path not in self.cache:
+            self.process.stdin.write(f"{self.commit}:{path}\n".encode())
+            self.process.stdin.flush()
+            header = self.process.stdout.readline().decode().split()
+            text = None
+            if len(header) == 3:
+                data = self.process.stdout.read(int(header[2]))
+                self.process.stdout.read(1)  # Trailing newline after the object content
+                if header[1] == "blob":
+                    text = data.decode("utf-8", errors="replace")
+            self.cache[path] = text
+        return self.cache[path]
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def parse_import_statement(import_statement):
+    """Map each name bound by an import statement to what it refers to
+
+    Returns {name: ("module", module)} for `import x` forms and
+    {name: ("attribute", module, attribute)} for `from x import y` forms.
+    """
+    bindings = {}
+    for node in ast.parse(import_statement).body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    bindings[alias.asname] = ("module", alias.name)
+                else:
+                    # `import a.b` binds `a`
+                    top_level = alias.name.split(".")[0]
+                    bindings[top_level] = ("module", top_level)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            for alias in node.names:
+                bindings[alias.asname or alias.name] = ("attribute", node.module, alias.name)
+        else:
+            raise ValueError(f"Unsupported import statement: {import_statement}")
+    return bindings
+
+def load_module_ast(read_source, module, module_cache):
+    """Parse the source file of a module, returning (tree, source, path, is_package) or None"""
+    if module not in module_cache:
+        base_path = module.replace(".", "/")
+        module_cache[module] = None
+        for path, is_package in ((f"{base_path}.py", False), (f"{base_path}/__init__.py", True)):
+            source = read_source(path)
+            if source is None:
+                continue
+            try:
+                tree = ast.parse(source)
+            except SyntaxError:
+                break
+            module_cache[module] = (tree, source, path, is_package)
+            break
+    return module_cache[module]
+
+def flatten_statements(body):
+    """Yield module level statements, descending into if/try blocks"""
+    for node in body:
+        if isinstance(node, ast.If):
+            yield from flatten_statements(node.body)
+            yield from flatten_statements(node.orelse)
+        elif isinstance(node, ast.Try):
+            yield from flatten_statements(node.body)
+            for handler in node.handlers:
+                yield from flatten_statements(handler.body)
+            yield from flatten_statements(node.orelse)
+            yield from flatten_statements(node.finalbody)
+        else:
+            yield node
+
+def resolve_relative_module(module, is_package, level, target):
+    """Resolve the module named by a (possibly relative) `from ... import`"""
+    if level == 0:
+        return target
+    package_parts = module.split(".") if is_package else module.split(".")[:-1]
+    if level > 1:
+        package_parts = package_parts[:-(level - 1)]
+    if target:
+        package_parts = package_parts + [target]
+    return ".".join(package_parts)
+
+def get_star_exports(tree):
+    """Get the names listed in a module's __all__, or None if it has no literal __all__"""
+    for node in flatten_statements(tree.body):
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets):
+            try:
+                return set(ast.literal_eval(node.value))
+            except ValueError:
+                return None
+    return None
+
+def resolve_module_attribute(read_source, module, name, module_cache, seen):
+    """Find what `module.name` refers to
+
+    Returns ("definition", node, module) for functions and classes,
+    ("module", module) for modules, or None if it cannot be resolved statically.
+    """
+    if (module, name) in seen:
+        return None
+    seen = seen | {(module, name)}
+
+    loaded = load_module_ast(read_source, module, module_cache)
+    if loaded is None:
+        return None
+    tree, _, _, is_package = loaded
+
+    # The last binding of a name wins, so walk the module backwards
+    for node in reversed(list(flatten_statements(tree.body))):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.name == name:
+            return ("definition", node, module)
+
+        if isinstance(node, ast.ImportFrom):
+            source_module = resolve_relative_module(module, is_package, node.level, node.module)
+            for alias in node.names:
+                if alias.name == "*":
+                    # Star imports only re-export __all__, or the public names without it
+                    star_module = load_module_ast(read_source, source_module, module_cache)
+                    exports = get_star_exports(star_module[0]) if star_module else None
+                    if exports is None and name.startswith("_"):
+                        continue
+                    if exports is not None and name not in exports:
+                        continue
+                    resolved = resolve_module_attribute(read_source, source_module, name, module_cache, seen)
+                    if resolved is not None:
+                        return resolved
+                elif (alias.asname or alias.name) == name:
+                    # `from package import submodule` imports the submodule when no attribute shadows it
+                    resolved = resolve_module_attribute(read_source, source_module, alias.name, module_cache, seen)
+                    if resolved is None and load_module_ast(read_source, f"{source_module}.{alias.name}", module_cache):
+                        resolved = ("module", f"{source_module}.{alias.name}")
+                    return resolved
+
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname == name:
+                    return ("module", alias.name)
+                if alias.asname is None and alias.name.split(".")[0] == name:
+                    return ("module", name)
+
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == name for t in node.targets):
+            # Follow plain aliases such as `moe = fused_moe` or `moe = ops.fused_moe`
+            if isinstance(node.value, (ast.Name, ast.Attribute)):
+                return resolve_expression(read_source, module, node.value, module_cache, seen)
+            return None
+
+    # Fall back to a submodule of a package
+    if is_package and load_module_ast(read_source, f"{module}.{name}", module_cache):
+        return ("module", f"{module}.{name}")
+    return None
+
+def resolve_expression(read_source, module, expression, module_cache, seen):
+    """Resolve a dotted name expression evaluated inside a module"""
+    parts = []
+    while isinstance(expression, ast.Attribute):
+        parts.insert(0, expression.attr)
+        expression = expression.value
+    if not isinstance(expression, ast.Name):
+        return None
+    resolved = resolve_module_attribute(read_source, module, expression.id, module_cache, seen)
+    return resolve_attribute_chain(read_source, resolved, parts, module_cache, seen)
+
+def resolve_attribute_chain(read_source, resolved, parts, module_cache, seen=frozenset()):
+    """Follow attribute accesses starting from an already resolved object"""
+    for part in parts:
+        if resolved is None:
+            return None
+        if resolved[0] == "module":
+            resolved = resolve_module_attribute(read_source, resolved[1], part, module_cache, seen)
+        elif isinstance(resolved[1], ast.ClassDef):
+            # Methods of a class
+            methods = [
+                node for node in resolved[1].body
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.name == part
+            ]
+            resolved = ("definition", methods[-1], resolved[2]) if methods else None
+        else:
+            return None
+    return resolved
+
+def format_static_signature(arguments, returns=None, skip_first=False):
+    """Build the signature string and parameter list the way inspect.signature reports them"""
+    positional = [(arg, "POSITIONAL_ONLY") for arg in arguments.posonlyargs]
+    positional += [(arg, "POSITIONAL_OR_KEYWORD") for arg in arguments.args]
+    # Defaults apply to the last positional parameters
+    defaults = [None] * (len(positional) - len(arguments.defaults)) + list(arguments.defaults)
+    entries = [(arg, kind, default) for (arg, kind), default in zip(positional, defaults)]
+    if arguments.vararg:
+        entries.append((arguments.vararg, "VAR_POSITIONAL", None))
+    entries += [
+        (arg, "KEYWORD_ONLY", default)
+        for arg, default in zip(arguments.kwonlyargs, arguments.kw_defaults)
+    ]
+    if arguments.kwarg:
+        entries.append((arguments.kwarg, "VAR_KEYWORD", None))
+    if skip_first and entries and entries[0][1] in ("POSITIONAL_ONLY", "POSITIONAL_OR_KEYWORD"):
+        entries = entries[1:]
+
+    rendered = []
+    params = []
+    keyword_marker_added = False
+    for index, (arg, kind, default) in enumerate(entries):
+        annotation = ast.unparse(arg.annotation) if arg.annotation else None
+        default_text = ast.unparse(default) if default is not None else None
+
+        text = arg.arg
+        if kind == "VAR_POSITIONAL":
+            text = f"*{text}"
+            keyword_marker_added = True
+        elif kind == "VAR_KEYWORD":
+            text = f"**{text}"
+        elif kind == "KEYWORD_ONLY" and not keyword_marker_added:
+            rendered.append("*")
+            keyword_marker_added = True
+        if annotation:
+            text += f": {annotation}"
+        if default_text is not None:
+            text += f" = {default_text}" if annotation else f"={default_text}"
+        rendered.append(text)
+        if kind == "POSITIONAL_ONLY" and (index + 1 == len(entries) or entries[index + 1][1] != "POSITIONAL_ONLY"):
+            rendered.append("/")
+
+        params.append({
+            "name": arg.arg,
+            "kind": kind,
+            "default": "NO_DEFAULT" if default_text is None else default_text,
+            "annotation": "NO_ANNOTATION" if annotation is None else annotation
+        })
+
+    signature = f"({', '.join(rendered)})"
+    if returns is not None:
+        signature += f" -> {ast.unparse(returns)}"
+    return signature, params
+
+def extract_signature_statically(read_source, import_statement, function_path, module_cache=None):
+    """Get a function signature by parsing the sources instead of importing them
+
+    `read_source(path)` returns the text of a repository file or None. Returns the same
+    result dict as check_function_in_subprocess, or None when the function cannot be
+    resolved statically.
+    """
+    if module_cache is None:
+        module_cache = {}
+    try:
+        bindings = parse_import_statement(import_statement)
+    except (SyntaxError, ValueError):
+        return None
+
+    parts = function_path.split(".")
+    binding = bindings.get(parts[0])
+    if binding is None:
+        return None
+    if binding[0] == "module":
+        resolved = resolve_attribute_chain(read_source, ("module", binding[1]), parts[1:], module_cache)
+    else:
+        resolved = resolve_attribute_chain(read_source, ("module", binding[1]), [binding[2]] + parts[1:], module_cache)
+
+    if resolved is None or resolved[0] != "definition":
+        return None
+
+    node, module = resolved[1], resolved[2]
+    if isinstance(node, ast.ClassDef):
+        # A class reports the signature of its __init__ without `self`
+        init = [n for n in node.body if isinstance(n, ast.FunctionDef) and n.name == "__init__"]
+        if not init:
+            return None
+        signature, params = format_static_signature(init[-1].args, skip_first=True)
+    else:
+        # A classmethod is bound to its class, so inspect.signature drops `cls`
+        bound = any(isinstance(d, ast.Name) and d.id == "classmethod" for d in node.decorator_list)
+        signature, params = format_static_signature(node.args, node.returns, skip_first=bound)
+
+    _, source, path, _ = module_cache[module]
+    first_line = min([node.lineno] + [d.lineno for d in node.decorator_list])
+    source_lines = source.splitlines(keepends=True)[first_line - 1:node.end_lineno]
+
+    return {
+        "exists": True,
+        "signature": signature,
+        "parameters": params,
+        "source": "".join(source_lines),
+        "error": None,
+        "extractor": "static",
+        "source_file": path
+    }
+
+def get_callable_fingerprint(signature, parameters):
+    """Hash the signature of a callable into a short fingerprint"""
+    return hashlib.sha256(json.dumps([signature, parameters]).encode()).hexdigest()[:16]
+
+def make_callable_record(signature, parameters):
+    """Build the compact surface record of one callable"""
+    return {
+        "fingerprint": get_callable_fingerprint(signature, parameters),
+        "signature": signature,
+        "parameters": parameters
+    }
+
+def enumerate_module_callables(source):
+    """List the public functions, classes and methods defined in a module source
+
+    Returns {qualified_name: record} in a single pass over the module's AST. Names
+    imported from other modules are left to the module that defines them.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {}
+    exports = get_star_exports(tree)
+    callables = {}
+    for node in flatten_statements(tree.body):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if node.name.startswith("_") or (exports is not None and node.name not in exports):
+            continue
+        if not isinstance(node, ast.ClassDef):
+            callables[node.name] = make_callable_record(*format_static_signature(node.args, node.returns))
+            continue
+
+        init = [n for n in node.body if isinstance(n, ast.FunctionDef) and n.name == "__init__"]
+        if init:
+            callables[node.name] = make_callable_record(*format_static_signature(init[-1].args, skip_first=True))
+        else:
+            callables[node.name] = make_callable_record(None, None)
+        for method in node.body:
+            if not isinstance(method, (ast.FunctionDef, ast.AsyncFunctionDef)) or method.name.startswith("_"):
+                continue
+            decorators = {d.id for d in method.decorator_list if isinstance(d, ast.Name)}
+            callables[f"{node.name}.{method.name}"] = make_callable_record(*format_static_signature(
+                method.args, method.returns, skip_first="staticmethod" not in decorators
+            ))
+    return callables
+
+def get_snapshot_cache_dir(config):
+    """Get the directory holding the signature snapshot cache"""
+    return os.path.expanduser(config.get("snapshot_cache_dir") or SNAPSHOT_CACHE_DIR)
+
+def get_import_packages(functions):
+    """Get the top level packages named by the import statements of the monitored functions"""
+    packages = set()
+    for func_config in functions:
+        try:
+            bindings = parse_import_statement(func_config["import_statement"])
+        except (SyntaxError, ValueError):
+            continue
+        for binding in bindings.values():
+            packages.add(binding[1].split(".")[0])
+    return sorted(packages)
+
+def get_source_fingerprint(mirror_dir, commit, functions):
+    """Hash the git blob ids of all Python sources of the monitored packages at a commit"""
+    result = subprocess.run(
+        ["git", "ls-tree", "-r", commit, "--"] + get_import_packages(functions),
+        cwd=mirror_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    entries = [line for line in result.stdout.splitlines() if line.endswith(".py")]
+    return hashlib.sha256("\n".join(entries).encode()).hexdigest()
+
+def get_stub_settings(config):
+    """Get the import hook settings of the stub extractor, passed to the inspection script"""
+    return {
+        "patterns": config.get("stub_modules", STUB_MODULES),
+        "missing": config.get("stub_missing_modules", True)
+    }
+
+def get_snapshot_key(config, func_config, source_fingerprint):
+    """Build the content address of a function snapshot"""
+    extractor = config.get("signature_extractor", "import")
+    key_data = json.dumps([
+        SNAPSHOT_EXTRACTOR_VERSION,
+        extractor,
+        # Stubbing other modules can change what a stubbed import sees
+        get_stub_settings(config) if extractor == "stub" else None,
+        # Snapshots taken without profiling have no import profile
+        bool(config.get("import_profiling", False)),
+        f"{sys.version_info.major}.{sys.version_info.minor}",
+        func_config["import_statement"],
+        func_config["function_path"],
+        source_fingerprint
+    ])
+    return hashlib.sha256(key_data.encode()).hexdigest()
+
+def load_snapshot(config, key):
+    """Load a cached snapshot, or None on a cache miss"""
+    path = os.path.join(get_snapshot_cache_dir(config), key[:2], f"{key}.json")
+    try:
+        with open(path, 'r') as f:
+            snapshot = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        SNAPSHOT_CACHE_STATS["misses"] += 1
+        return None
+    # The mtime records the last use for the LRU eviction
+    os.utime(path)
+    SNAPSHOT_CACHE_STATS["hits"] += 1
+    return snapshot
+
+def store_snapshot(config, key, snapshot):
+    """Store a snapshot in the cache, unless it only records a failure"""
+    # Failed imports usually come from the build environment, not from the sources
+    if not snapshot.get("exists"):
         return
+    path = os.path.join(get_snapshot_cache_dir(config), key[:2], f"{key}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+def prune_snapshot_cache(config):
+    """Evict the least recently used snapshots above the configured cache size"""
+    cache_dir = get_snapshot_cache_dir(config)
+    if not os.path.isdir(cache_dir):
+        return
+
+    max_size = config.get("snapshot_cache_max_size_mb", SNAPSHOT_CACHE_MAX_SIZE_MB) * 1024 ** 2
+    entries = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(size for _, size, _ in entries)
+    if total_size <= max_size:
+        return
+
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        with contextlib.suppress(OSError):
+            os.remove(path)
+            evicted += 1
+        total_size -= size
+    logger.info(f"Evicted {evicted} snapshots from the snapshot cache")
+
+def get_changed_paths(mirror_dir, old_commit, new_commit):
+    """Get the paths changed between two commits, and the subset that was added or deleted"""
+    key = (mirror_dir, old_commit, new_commit)
+    info = COMMIT_INDEX.get(new_commit)
+    if key not in CHANGED_PATHS_CACHE and info and info.get("parents") == [old_commit]:
+        # The metadata index already holds the changes of a commit against its only parent
+        CHANGED_PATHS_CACHE[key] = (frozenset(info["paths"]), frozenset(info["added_or_deleted"]))
+    if key not in CHANGED_PATHS_CACHE:
+        result = subprocess.run(
+            ["git", "diff", "--name-status", "--no-renames", "-z", old_commit, new_commit],
+            cwd=mirror_dir,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        fields = result.stdout.split("\0")
+        changed, added_or_deleted = set(), set()
+        for status, path in zip(fields[0::2], fields[1::2]):
+            changed.add(path)
+            if status in ("A", "D"):
+                added_or_deleted.add(path)
+        CHANGED_PATHS_CACHE[key] = (frozenset(changed), frozenset(added_or_deleted))
+    return CHANGED_PATHS_CACHE[key]
+
+def module_to_path(module, files):
+    """Get the repository path of a module's source file, or None if it is not in the repository"""
+    base_path = module.replace(".", "/")
+    for path in (f"{base_path}.py", f"{base_path}/__init__.py"):
+        if path in files:
+            return path
+    return None
+
+def path_to_module(path):
+    """Get the module name of a repository source file"""
+    module_path = path[:-len("/__init__.py")] if path.endswith("/__init__.py") else path[:-len(".py")]
+    return module_path.replace("/", "."), path.endswith("/__init__.py")
+
+def with_parent_modules(module):
+    """Importing `a.b.c` also imports `a` and `a.b`"""
+    parts = module.split(".")
+    return [".".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+def parse_import_edges(source, path, files):
+    """Get the repository files a source file imports, at module level or inside functions"""
+    module, is_package = path_to_module(path)
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return set()
+
+    imported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported.update(with_parent_modules(alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            base = resolve_relative_module(module, is_package, node.level, node.module)
+            if not base:
+                continue
+            imported.update(with_parent_modules(base))
+            # `from package import name` may import a submodule
+            imported.update(f"{base}.{alias.name}" for alias in node.names if alias.name != "*")
+
+    edges = {module_to_path(name, files) for name in imported}
+    edges.discard(None)
+    edges.discard(path)
+    return edges
+
+def get_root_modules(functions):
+    """Get the modules the monitored import statements and function paths can reach directly"""
+    roots = set()
+    for func_config in functions:
+        try:
+            bindings = parse_import_statement(func_config["import_statement"])
+        except (SyntaxError, ValueError):
+            continue
+        parts = func_config["function_path"].split(".")
+        binding = bindings.get(parts[0])
+        for bound in bindings.values():
+            roots.update(with_parent_modules(bound[1]))
+            if bound[0] == "attribute":
+                roots.add(f"{bound[1]}.{bound[2]}")
+        if binding is not None:
+            # Attribute accesses in the function path may walk into submodules
+            base = binding[1] if binding[0] == "module" else f"{binding[1]}.{binding[2]}"
+            for part in parts[1:]:
+                base = f"{base}.{part}"
+                roots.add(base)
+    return roots
+
+def compute_import_graph(mirror_dir, commit, functions):
+    """Compute the static import closure of the monitored import statements at a commit"""
+    result = subprocess.run(
+        ["git", "ls-tree", "-r", "--name-only", commit, "--"] + get_import_packages(functions),
+        cwd=mirror_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    files = {path for path in result.stdout.splitlines() if path.endswith(".py")}
+
+    queue = [module_to_path(module, files) for module in get_root_modules(functions)]
+    edges = {}
+    reader = GitSourceReader(mirror_dir, commit)
+    try:
+        while queue:
+            path = queue.pop()
+            if path is None or path in edges:
+                continue
+            edges[path] = parse_import_edges(reader.read(path) or "", path, files)
+            queue.extend(edges[path])
+    finally:
+        reader.close()
+
+    return {"commit": commit, "files": files, "edges": edges, "closure": frozenset(edges)}
+
+def get_import_closure(mirror_dir, commit, functions):
+    """Get the set of files in the import closure at a commit
+
+    The graph of the previous call is reused and only rebuilt when a file in the
+    closure changed its imports, or Python files were added or deleted.
+    """
+    functions_key = json.dumps(sorted((f["import_statement"], f["function_path"]) for f in functions))
+    graph = IMPORT_GRAPH_CACHE.get(mirror_dir)
+
+    if graph is None or graph["functions_key"] != functions_key:
+        logger.info(f"Computing import closure at {commit}")
+        graph = compute_import_graph(mirror_dir, commit, functions)
+    elif graph["commit"] != commit:
+        changed, added_or_deleted = get_changed_paths(mirror_dir, graph["commit"], commit)
+        packages = get_import_packages(functions)
+        rebuild = any(path.endswith(".py") and path.split("/")[0] in packages for path in added_or_deleted)
+        changed_in_closure = changed & graph["closure"]
+        if changed_in_closure and not rebuild:
+            reader = GitSourceReader(mirror_dir, commit)
+            try:
+                new_edges = {
+                    path: parse_import_edges(reader.read(path) or "", path, graph["files"])
+                    for path in changed_in_closure
+                }
+            finally:
+                reader.close()
+            rebuild = any(new_edges[path] != graph["edges"][path] for path in changed_in_closure)
+        if rebuild:
+            logger.info(f"Import graph changed at {commit}, recomputing import closure")
+            graph = compute_import_graph(mirror_dir, commit, functions)
+        else:
+            graph["commit"] = commit
+
+    graph["functions_key"] = functions_key
+    IMPORT_GRAPH_CACHE[mirror_dir] = graph
+    return graph["closure"]
+
+def is_commit_irrelevant(config, mirror_dir, previous_commit, commit):
+    """Check whether a commit leaves every file in the import closure and the monitored modules untouched"""
+    functions = config["functions_to_monitor"]
+    changed, _ = get_changed_paths(mirror_dir, previous_commit, commit)
+    for module_config in config.get("modules_to_monitor", []):
+        base_path = module_config["module"].replace(".", "/")
+        if any(path == f"{base_path}.py" or path.startswith(f"{base_path}/") for path in changed):
+            return False
+    closure = get_import_closure(mirror_dir, commit, functions)
+    return not (changed & closure)
+
+def get_gitlinks(repo_dir, commit):
+    """Get the submodule pointers of a commit as {path: commit}"""
+    result = subprocess.run(
+        ["git", "ls-tree", "-r", "-z", commit],
+        cwd=repo_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    gitlinks = {}
+    for entry in result.stdout.split("\0"):
+        if entry.startswith("160000 "):
+            info, path = entry.split("\t", 1)
+            gitlinks[path] = info.split()[2]
+    return gitlinks
+
+def update_submodule_cache(config, url, commit):
+    """Make sure the reference clone of a submodule has a commit, returning (cache_dir, fetched)"""
+    cache_dir = os.path.join(get_submodule_cache_dir(config), get_cache_repo_name(url))
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    with open(f"{cache_dir}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        exists = os.path.exists(os.path.join(cache_dir, "HEAD"))
+        if exists and commit_exists(cache_dir, commit):
+            return cache_dir, False
+
+        size_before = get_directory_size(cache_dir) if exists else 0
+        with timed_stage("submodule_fetch"):
+            if not exists:
+                logger.info(f"Creating submodule reference clone of {url} in {cache_dir}")
+                partial_dir = cache_dir + ".partial"
+                shutil.rmtree(partial_dir, ignore_errors=True)
+                subprocess.run(["git", "clone", "--bare", url, partial_dir], check=True)
+                subprocess.run(["git", "config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"], cwd=partial_dir, check=True)
+                os.rename(partial_dir, cache_dir)
+            else:
+                subprocess.run(["git", "fetch", "--prune", "--tags", "origin"], cwd=cache_dir, check=True)
+            # Submodule pointers may reference commits that are on no branch
+            ensure_commit_in_mirror(cache_dir, commit)
+        CYCLE_COUNTERS["bytes_fetched"] += max(get_directory_size(cache_dir) - size_before, 0)
+    return cache_dir, True
+
+def update_submodules(config, checkout_dir):
+    """Initialise and update the submodules of a checkout, borrowing objects from the reference clones"""
+    subprocess.run(["git", "submodule", "sync", "--recursive"], cwd=checkout_dir, check=True)
+    if not config.get("submodule_reference_cache", True):
+        subprocess.run(["git", "submodule", "update", "--init", "--recursive"], cwd=checkout_dir, check=True)
+        return
+
+    subprocess.run(["git", "submodule", "init"], cwd=checkout_dir, check=True)
+    result = subprocess.run(
+        ["git", "config", "-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.path$"],
+        cwd=checkout_dir,
+        capture_output=True,
+        text=True
+    )
+    names = {}
+    for line in result.stdout.splitlines():
+        key, path = line.split(" ", 1)
+        names[path] = key[len("submodule."):-len(".path")]
+
+    reused, fetched = [], []
+    for path, commit in get_gitlinks(checkout_dir, "HEAD").items():
+        url = subprocess.run(
+            ["git", "config", "--get", f"submodule.{names.get(path, path)}.url"],
+            cwd=checkout_dir,
+            capture_output=True,
+            text=True
+        ).stdout.strip()
+        command = ["git", "submodule", "update", "--init", "--recursive"]
+        if url:
+            try:
+                cache_dir, was_fetched = update_submodule_cache(config, url, commit)
+                (fetched if was_fetched else reused).append(path)
+                # Only a new clone picks up the reference, existing clones already borrow from it
+                command += ["--reference", cache_dir]
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"Could not update the reference clone of submodule {path}, cloning it directly: {e}")
+                fetched.append(path)
+        subprocess.run(command + ["--", path], cwd=checkout_dir, check=True)
+
+    CYCLE_COUNTERS["submodules_reused"] += len(reused)
+    CYCLE_COUNTERS["submodules_fetched"] += len(fetched)
+    logger.info(f"Submodules reused from the reference cache: {', '.join(reused) or 'none'}")
+    logger.info(f"Submodules fetched: {', '.join(fetched) or 'none'}")
+
+def prepare_checkout(config, checkout_dir, strict=True, env=None, submodules_ready=False):
+    """Update submodules and install aiter in a commit checkout, returning whether the install succeeded"""
+    if not submodules_ready:
+        logger.info("Updating submodules")
+        with timed_stage("submodule_update"):
+            update_submodules(config, checkout_dir)
+
+    logger.info("Installing aiter package")
+    try:
+        install_command = [sys.executable, "setup.py", "develop"]
+        if WORKER_INSTALL_DIR:
+            install_command += ["--install-dir", WORKER_INSTALL_DIR]
+        with timed_stage("build"):
+            subprocess.run(install_command, cwd=checkout_dir, env=env, check=True)
+        logger.info("Successfully installed aiter")
+        return True
+    except subprocess.CalledProcessError as e:
+        if strict:
+            raise
+        logger.warning(f"Installation had issues, but continuing: {e}")
+        return False
+
+def get_build_cache_dir(config):
+    """Get the directory holding the persistent build slots and compiler cache"""
+    return os.path.expanduser(config.get("build_cache_dir") or BUILD_CACHE_DIR)
+
+def get_build_fingerprint(config, mirror_dir, commit):
+    """Hash everything that decides the build: the build input paths and all submodule pointers"""
+    build_inputs = config.get("build_input_paths", BUILD_INPUT_PATHS)
+    result = subprocess.run(
+        ["git", "ls-tree", "-r", commit],
+        cwd=mirror_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    entries = []
+    for line in result.stdout.splitlines():
+        mode, path = line.split(" ", 1)[0], line.split("\t", 1)[1]
+        if mode == "160000" or any(path == p or path.startswith(f"{p}/") for p in build_inputs):
+            entries.append(line)
+    return hashlib.sha256("\n".join(entries).encode()).hexdigest()
+
+def get_build_env(config):
+    """Get the environment for builds, pointing compiler and extension caches at persistent directories"""
+    cache_dir = get_build_cache_dir(config)
+    env = dict(os.environ)
+    env["CCACHE_DIR"] = os.path.join(cache_dir, "ccache")
+    env["TORCH_EXTENSIONS_DIR"] = os.path.join(cache_dir, "torch_extensions")
+    if shutil.which("ccache"):
+        # ccache masquerade directories wrap gcc, g++, hipcc and friends found on PATH
+        for masquerade_dir in ("/usr/lib/ccache", "/usr/lib64/ccache"):
+            if os.path.isdir(masquerade_dir):
+                env["PATH"] = os.pathsep.join([masquerade_dir, env.get("PATH", "")])
+                break
+    return env
+
+@contextlib.contextmanager
+def acquire_build_slot(config, mirror_dir):
+    """Lock one of the persistent build slots of a mirror, yielding (slot_dir, state_path)"""
+    slots_dir = os.path.join(get_build_cache_dir(config), os.path.basename(mirror_dir))
+    os.makedirs(slots_dir, exist_ok=True)
+    slot_count = max(config.get("parallel_workers", 1), 1)
+
+    index = None
+    for candidate in range(slot_count):
+        lock_file = open(os.path.join(slots_dir, f"slot-{candidate}.lock"), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            index = candidate
+            break
+        except BlockingIOError:
+            lock_file.close()
+    if index is None:
+        # Every slot is busy, wait for one
+        index = os.getpid() % slot_count
+        lock_file = open(os.path.join(slots_dir, f"slot-{index}.lock"), 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+    try:
+        yield os.path.join(slots_dir, f"slot-{index}"), os.path.join(slots_dir, f"slot-{index}.json")
+    finally:
+        lock_file.close()
+
+@contextlib.contextmanager
+def build_slot_checkout(config, mirror_dir, commit, strict=True):
+    """Check out and build a commit in a persistent build slot, reusing the previous build
+
+    The build is skipped when no build input changed since the commit last built in the
+    slot, since the checkout only swaps the Python sources. Otherwise the existing build
+    tree and the persistent compiler cache make the build incremental.
+    """
+    ensure_commit_in_mirror(mirror_dir, commit)
+    with acquire_build_slot(config, mirror_dir) as (slot_dir, state_path):
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            state = {}
+
+        valid_slot = os.path.exists(os.path.join(slot_dir, ".git")) and subprocess.run(
+            ["git", "rev-parse", "--is-inside-work-tree"], cwd=slot_dir, capture_output=True
+        ).returncode == 0
+        with timed_stage("checkout"):
+            if valid_slot:
+                logger.info(f"Checking out commit {commit} in build slot {slot_dir}")
+                subprocess.run(["git", "checkout", "--force", "--detach", commit], cwd=slot_dir, check=True)
+            else:
+                logger.info(f"Creating build slot {slot_dir} at commit {commit}")
+                shutil.rmtree(slot_dir, ignore_errors=True)
+                subprocess.run(["git", "worktree", "prune"], cwd=mirror_dir, check=False)
+                subprocess.run(["git", "worktree", "add", "--detach", "--force", slot_dir, commit], cwd=mirror_dir, check=True)
+                state = {}
+
+        fingerprint = get_build_fingerprint(config, mirror_dir, commit)
+        if state.get("built") and state.get("build_fingerprint") == fingerprint:
+            logger.info(f"Build for commit {commit}: skipped, build inputs unchanged since {state['commit']}")
+            CYCLE_COUNTERS["builds_skipped"] += 1
+        else:
+            build_kind = "incremental" if state.get("built") else "full"
+            CYCLE_COUNTERS[f"builds_{build_kind}"] += 1
+            logger.info(f"Build for commit {commit}: {build_kind}")
+            gitlinks = get_gitlinks(mirror_dir, commit)
+            # `git checkout` leaves the submodule working trees alone, so they still match unchanged pointers
+            submodules_ready = state.get("gitlinks") == gitlinks
+            if submodules_ready:
+                logger.info(f"Submodule update for commit {commit}: skipped, submodule pointers unchanged since {state['commit']}")
+                CYCLE_COUNTERS["submodule_updates_skipped"] += 1
+            state = {
+                "commit": commit,
+                "build_fingerprint": fingerprint,
+                "built": False,
+                "gitlinks": gitlinks if submodules_ready else None
+            }
+            with open(state_path, 'w') as f:
+                json.dump(state, f)
+            state["built"] = prepare_checkout(
+                config, slot_dir, strict, env=get_build_env(config), submodules_ready=submodules_ready
+            )
+            state["gitlinks"] = gitlinks
+            with open(state_path, 'w') as f:
+                json.dump(state, f)
+
+        yield slot_dir
+
+@contextlib.contextmanager
+def checkout_for_inspection(config, mirror_dir, commit, strict=True):
+    """Check out and build a commit for import-based inspection"""
+    if config.get("build_reuse", True):
+        with build_slot_checkout(config, mirror_dir, commit, strict) as checkout_dir:
+            yield checkout_dir
+    else:
+        # A fresh worktree has empty submodule directories, so the update cannot be skipped here
+        with commit_worktree(mirror_dir, commit) as checkout_dir:
+            prepare_checkout(config, checkout_dir, strict)
+            yield checkout_dir
+
+def collect_signatures(config, mirror_dir, commit, strict=True):
+    """Get the current signature of every monitored function at a commit
+
+    Snapshots already in the content-addressed cache are reused without a checkout.
+    With the static extractor the sources are parsed straight from the mirror clone,
+    and only functions that cannot be resolved that way are checked out, built and imported.
+    """
+    ensure_commit_in_mirror(mirror_dir, commit)
+    signatures = {}
+    source_fingerprint = get_source_fingerprint(mirror_dir, commit, config["functions_to_monitor"])
+    snapshot_keys = {}
+    pending = []
+    for func_config in config["functions_to_monitor"]:
+        key = get_snapshot_key(config, func_config, source_fingerprint)
+        snapshot_keys[func_config["function_path"]] = key
+        snapshot = load_snapshot(config, key)
+        if snapshot is not None:
+            signatures[func_config["function_path"]] = snapshot
+        else:
+            pending.append(func_config)
+    logger.info(
+        f"Snapshot cache: {len(signatures)} hits, {len(pending)} misses for commit {commit} "
+        f"(total {SNAPSHOT_CACHE_STATS['hits']} hits, {SNAPSHOT_CACHE_STATS['misses']} misses)"
+    )
+    CYCLE_COUNTERS["snapshot_hits"] += len(signatures)
+    CYCLE_COUNTERS["snapshot_misses"] += len(pending)
+    if not pending:
+        return signatures
+    cached = set(signatures)
+
+    if config.get("signature_extractor", "import") == "static":
+        reader = GitSourceReader(mirror_dir, commit)
+        module_cache = {}
+        try:
+            with timed_stage("static_extraction"):
+                for func_config in pending:
+                    result = extract_signature_statically(
+                        reader.read, func_config["import_statement"], func_config["function_path"], module_cache
+                    )
+                    if result is not None:
+                        signatures[func_config["function_path"]] = result
+        finally:
+            reader.close()
+        pending = [f for f in pending if f["function_path"] not in signatures]
+        if pending:
+            logger.info(f"Static resolution failed for {', '.join(f['function_path'] for f in pending)}, falling back to import")
+
+    preload_modules = config.get("preload_modules", PRELOAD_MODULES) if config.get("inspection_server", True) else None
+    if pending and config.get("signature_extractor", "import") == "stub":
+        # Only the Python sources are needed, so nothing is built and submodules stay empty
+        with commit_worktree(mirror_dir, commit) as checkout_dir:
+            # A server has already imported its preload modules, which the stubs must replace
+            results = check_functions_in_subprocess(
+                checkout_dir, pending, config.get("inspection_timeout_seconds", INSPECTION_TIMEOUT),
+                None, get_stub_settings(config)
+            )
+        for function_path, result in results.items():
+            result["extractor"] = "stub"
+            if result.get("stubbed_modules"):
+                logger.info(f"Stubbed modules for {function_path}: {', '.join(result['stubbed_modules'])}")
+        signatures.update(results)
+        pending = []
+
+    if pending:
+        with checkout_for_inspection(config, mirror_dir, commit, strict) as checkout_dir:
+            if config.get("batch_inspection", True):
+                signatures.update(check_functions_in_subprocess(
+                    checkout_dir, pending, config.get("inspection_timeout_seconds", INSPECTION_TIMEOUT), preload_modules
+                ))
+            else:
+                for func_config in pending:
+                    signatures[func_config["function_path"]] = check_function_in_subprocess(
+                        checkout_dir, func_config["import_statement"], func_config["function_path"],
+                        config.get("inspection_timeout_seconds", INSPECTION_TIMEOUT)
+                    )
+            if config.get("import_profiling", False):
+                # Profiles travel with the snapshots, so cached snapshots keep the profile of their commit
+                profiles = profile_imports(config, checkout_dir, pending)
+                for func_config in pending:
+                    signatures[func_config["function_path"]]["import_profile"] = profiles[func_config["import_statement"]]
+
+    for function_path, snapshot in signatures.items():
+        if function_path not in cached:
+            store_snapshot(config, snapshot_keys[function_path], snapshot)
+    return signatures
+
+
+def init_pool_worker(memory_limit_mb, install_root):
+    """Give a pool worker its own install location and an optional memory limit"""
+    global WORKER_INSTALL_DIR, INSPECTION_SERVER
+    # `setup.py develop` writes easy-install.pth, so parallel builds install into a private directory.
+    # Pool workers exit without running atexit handlers, so the parent removes `install_root`.
+    WORKER_INSTALL_DIR = tempfile.mkdtemp(prefix="site_", dir=install_root)
+    # Nothing would stop a server of a worker, and each worker inspects one commit at a time anyway
+    INSPECTION_SERVER = False
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [WORKER_INSTALL_DIR, os.environ.get("PYTHONPATH")]))
+    if memory_limit_mb:
+        # The address space limit is inherited by the build and inspection subprocesses
+        limit = memory_limit_mb * 1024 ** 2
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def collect_signatures_in_worker(config, mirror_dir, commit, strict):
+    """Run collect_signatures in a pool worker, returning the worker's metrics with the signatures"""
+    reset_metrics()
+    signatures = collect_signatures(config, mirror_dir, commit, strict)
+    return signatures, STAGE_METRICS, dict(CYCLE_COUNTERS)
+
+def iter_commit_signatures(config, mirror_dir, commits, strict=True):
+    """Collect the signatures of several commits, yielding (commit, signatures, error) in order
+
+    With parallel_workers above 1 the commits are prepared and inspected in a process
+    pool, each in its own worktree and install location, while the results are still
+    yielded in the order of `commits`. Only a bounded window of commits is in flight.
+    """
+    workers = config.get("parallel_workers", 1)
+    if workers <= 1 or len(commits) <= 1:
+        for commit in commits:
+            CYCLE_COUNTERS["commits_checked"] += 1
+            try:
+                yield commit, collect_signatures(config, mirror_dir, commit, strict), None
+            except Exception as e:
+                yield commit, None, e
+        return
+
+    logger.info(f"Inspecting {len(commits)} commits with {workers} workers")
+    install_root = tempfile.mkdtemp(prefix="aiter_worker_site_")
+
+    def start_pool():
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_pool_worker,
+            initargs=(config.get("worker_memory_limit_mb", 0), install_root)
+        )
+
+    executor = start_pool()
+    remaining = iter(commits)
+    in_flight = collections.deque()
+    try:
+        for commit in itertools.islice(remaining, workers * 2):
+            in_flight.append((commit, executor.submit(collect_signatures_in_worker, config, mirror_dir, commit, strict)))
+
+        while in_flight:
+            commit, future = in_flight.popleft()
+            next_commit = next(remaining, None)
+            if next_commit is not None:
+                in_flight.append((next_commit, None))
+
+            try:
+                result, worker_stages, worker_counters = future.result()
+                merge_metrics(worker_stages, worker_counters)
+                error = None
+            except concurrent.futures.process.BrokenProcessPool as e:
+                # A worker died, for example over its memory limit. Restart the pool for the other commits.
+                logger.error(f"Worker pool broke while inspecting commit {commit}, restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = start_pool()
+                in_flight = collections.deque((c, None) for c, _ in in_flight)
+                result, error = None, e
+            except Exception as e:
+                result, error = None, e
+
+            CYCLE_COUNTERS["commits_checked"] += 1
+            in_flight = collections.deque(
+                (c, f if f is not None else executor.submit(collect_signatures_in_worker, config, mirror_dir, c, strict))
+                for c, f in in_flight
+            )
+            yield commit, result, error
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(install_root, ignore_errors=True)
+
+def normalize_annotation(annotation):
+    """Render an annotation the same way for the import and static extractors
+
+    inspect reports `typing.Optional[int]` or `<class 'torch.Tensor'>` where the
+    sources say `Optional[int]` or `torch.Tensor`, so module qualifiers and string
+    quotes are dropped.
+    """
+    annotation = re.sub(r"<class '([\w.]+)'>", r"\1", annotation)
+    if len(annotation) > 1 and annotation[0] == annotation[-1] and annotation[0] in "'\"":
+        annotation = annotation[1:-1]
+    return strip_qualifiers(annotation)
+
+def normalize_default(default):
+    """Render a default value the same way for the import and static extractors
+
+    inspect reports the repr of the value, such as `<ActivationType.Silu: 0>` or
+    `<function silu at 0x7f...>`, where the sources say `ActivationType.Silu` or `silu`.
+    """
+    if default == "NO_DEFAULT":
+        return default
+    default = re.sub(r"<([\w.]+): [^<>]*>", r"\1", default)
+    default = re.sub(r"<(?:function|built-in function|class) '?([\w.<>]+?)'?(?: at 0x[0-9a-f]+)?>", r"\1", default)
+    try:
+        # Literals compare by value, whatever their quotes or spelling in the sources
+        default = repr(ast.literal_eval(default))
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        pass
+    return strip_qualifiers(default)
+
+def strip_qualifiers(text):
+    """Drop the module and class qualifiers of the dotted names in a rendered annotation or default"""
+    return re.sub(r"\b(?:[A-Za-z_]\w*\.)+(?=[A-Za-z_])", "", text)
+
+def extractors_differ(previous_signature, current_signature):
+    """Check whether one snapshot was parsed statically and the other was inspected after an import"""
+    return (previous_signature.get("extractor") == "static") != (current_signature.get("extractor") == "static")
+
+def get_comparable_parameters(previous_signature, current_signature):
+    """Get the parameter lists of two snapshots in a form that compares across extractors"""
+    prev_params = previous_signature.get("parameters")
+    curr_params = current_signature.get("parameters")
+    if not extractors_differ(previous_signature, current_signature) or prev_params is None or curr_params is None:
+        return prev_params, curr_params
+    return (
+        [dict(p, annotation=normalize_annotation(p["annotation"]), default=normalize_default(p["default"])) for p in prev_params],
+        [dict(p, annotation=normalize_annotation(p["annotation"]), default=normalize_default(p["default"])) for p in curr_params]
+    )
+
+def signature_changed(previous_signature, current_signature):
+    """Check whether a function appeared, disappeared or changed its signature
+
+    Snapshots taken by the static and the import extractor render annotations
+    differently, so they are compared by their normalised parameters.
+    """
+    if previous_signature.get("exists") != current_signature.get("exists"):
+        return True
+    if extractors_differ(previous_signature, current_signature):
+        prev_params, curr_params = get_comparable_parameters(previous_signature, current_signature)
+        if prev_params is not None and curr_params is not None:
+            return prev_params != curr_params
+    return previous_signature.get("signature") != current_signature.get("signature")
+
+POSITIONAL_KINDS = ("POSITIONAL_ONLY", "POSITIONAL_OR_KEYWORD")
+VARIADIC_KINDS = ("VAR_POSITIONAL", "VAR_KEYWORD")
+# Kind changes that every existing call still satisfies
+COMPATIBLE_KIND_CHANGES = {
+    ("POSITIONAL_ONLY", "POSITIONAL_OR_KEYWORD"),
+    ("KEYWORD_ONLY", "POSITIONAL_OR_KEYWORD"),
+}
+
+def make_change(change, breaking, parameter=None, old=None, new=None):
+    """Build one entry of a signature diff record"""
+    return {"change": change, "parameter": parameter, "old": old, "new": new, "breaking": breaking}
+
+def diff_parameters(prev_params, curr_params):
+    """Diff two parameter lists, indexed by name and position"""
+    changes = []
+    prev_index = {p["name"]: (position, p) for position, p in enumerate(prev_params)}
+    curr_index = {p["name"]: (position, p) for position, p in enumerate(curr_params)}
+
+    for name, (_, prev_param) in prev_index.items():
+        if name not in curr_index:
+            changes.append(make_change("parameter_removed", True, name, old=prev_param["kind"]))
+
+    # A new positional parameter in front of an existing one shifts positional calls
+    last_prev_positional = max(
+        (curr_index[p["name"]][0] for p in prev_params
+         if p["kind"] in POSITIONAL_KINDS and p["name"] in curr_index),
+        default=-1
+    )
+    for name, (position, curr_param) in curr_index.items():
+        if name in prev_index:
+            continue
+        required = curr_param["default"] == "NO_DEFAULT" and curr_param["kind"] not in VARIADIC_KINDS
+        shifts = curr_param["kind"] in POSITIONAL_KINDS and position < last_prev_positional
+        changes.append(make_change("parameter_added", required or shifts, name, new=curr_param["kind"]))
+
+    for name, (_, prev_param) in prev_index.items():
+        if name not in curr_index:
+            continue
+        curr_param = curr_index[name][1]
+        if prev_param["kind"] != curr_param["kind"]:
+            breaking = (prev_param["kind"], curr_param["kind"]) not in COMPATIBLE_KIND_CHANGES
+            changes.append(make_change("kind_changed", breaking, name, prev_param["kind"], curr_param["kind"]))
+        if prev_param["default"] != curr_param["default"]:
+            breaking = curr_param["default"] == "NO_DEFAULT"
+            changes.append(make_change("default_changed", breaking, name, prev_param["default"], curr_param["default"]))
+        if prev_param["annotation"] != curr_param["annotation"]:
+            changes.append(make_change("annotation_changed", False, name, prev_param["annotation"], curr_param["annotation"]))
+
+    # Only the order of positional parameters matters to callers
+    positional = {
+        name for name, (_, p) in prev_index.items()
+        if p["kind"] in POSITIONAL_KINDS and name in curr_index and curr_index[name][1]["kind"] in POSITIONAL_KINDS
+    }
+    prev_order = [p["name"] for p in prev_params if p["name"] in curr_index]
+    curr_order = [p["name"] for p in curr_params if p["name"] in prev_index]
+    prev_positional = [name for name in prev_order if name in positional]
+    curr_positional = [name for name in curr_order if name in positional]
+    if prev_positional != curr_positional:
+        changes.append(make_change("parameters_reordered", True, old=prev_positional, new=curr_positional))
+    elif prev_order != curr_order:
+        changes.append(make_change("parameters_reordered", False, old=prev_order, new=curr_order))
+
+    return changes
+
+def diff_signatures(previous_signature, current_signature):
+    """Build the machine-readable diff record between two signatures
+
+    Every change is classified as breaking when an existing call can fail
+    (removed function or parameter, new required parameter, reordered
+    positional parameters) and compatible otherwise.
+    """
+    previous_exists = previous_signature.get("exists", False)
+    current_exists = current_signature.get("exists", False)
+    changes = []
+    if not signature_changed(previous_signature, current_signature):
+        status = "unchanged"
+    elif previous_exists and not current_exists:
+        status = "removed"
+        changes.append(make_change("function_removed", True, old=previous_signature.get("signature")))
+    elif current_exists and not previous_exists:
+        status = "added"
+        changes.append(make_change("function_added", False, new=current_signature.get("signature")))
+    else:
+        status = "changed"
+        prev_params, curr_params = get_comparable_parameters(previous_signature, current_signature)
+        if prev_params is not None and curr_params is not None:
+            changes = diff_parameters(prev_params, curr_params)
+        if not changes:
+            # Parameters are equal, so only the return annotation or its repr changed
+            changes.append(make_change(
+                "signature_changed", False,
+                old=previous_signature.get("signature"), new=current_signature.get("signature")
+            ))
+
+    if not changes:
+        classification = None
+    elif any(change["breaking"] for change in changes):
+        classification = "breaking"
+    else:
+        classification = "compatible"
+    return {
+        "status": status,
+        "classification": classification,
+        "previous_signature": previous_signature.get("signature"),
+        "current_signature": current_signature.get("signature"),
+        "changes": changes
+    }
+
+def describe_change(change):
+    """Describe one entry of a signature diff record"""
+    kind = change["change"]
+    name = change["parameter"]
+    label = "breaking" if change["breaking"] else "compatible"
+    if kind == "function_removed":
+        text = "Function removed"
+    elif kind == "function_added":
+        text = "Function added"
+    elif kind == "parameter_removed":
+        text = f"Removed parameter '{name}'"
+    elif kind == "parameter_added":
+        text = f"Added {change['new']} parameter '{name}'"
+    elif kind == "parameters_reordered":
+        text = f"Parameter order changed: {', '.join(change['old'])} -> {', '.join(change['new'])}"
+    elif kind == "kind_changed":
+        text = f"Parameter '{name}' kind changed from {change['old']} to {change['new']}"
+    elif kind == "default_changed":
+        text = f"Parameter '{name}' default value changed from {change['old']} to {change['new']}"
+    elif kind == "annotation_changed":
+        text = f"Parameter '{name}' type annotation changed from {change['old']} to {change['new']}"
+    else:
+        text = "Signature changed without parameter changes"
+    return f"{text} ({label})"
+
+def format_diff_section(diff):
+    """Format a signature diff record for an issue body"""
+    changes = "\n".join(f"- {describe_change(change)}" for change in diff["changes"])
+    return f"""### Classification
+{diff['classification'] or 'none'}
+
+### Parameter Changes
+{changes or '- No parameter changes detected'}
+
+<details>
+<summary>Diff record</summary>
+
+```json
+{json.dumps(diff, indent=2)}
+```
+</details>"""
+
+def should_notify(config, func_config, diff):
+    """Check whether a diff passes the notification rules of a function"""
+    notify_on = func_config.get("notify_on", config.get("notify_on", NOTIFY_ON))
+    return diff["classification"] in notify_on
+
+def find_import_regressions(config, previous, current):
+    """List the import time and memory regressions between two import profiles"""
+    threshold = config.get("import_regression_threshold", IMPORT_REGRESSION_THRESHOLD)
+    regressions = []
+    time_increase = current["wall_seconds"] - previous["wall_seconds"]
+    if time_increase > max(previous["wall_seconds"] * threshold, config.get("import_regression_min_seconds", IMPORT_REGRESSION_MIN_SECONDS)):
+        regressions.append(
+            f"Import time: {previous['wall_seconds']:.2f}s -> {current['wall_seconds']:.2f}s "
+            f"(+{time_increase / max(previous['wall_seconds'], 1e-6):.0%})"
+        )
+    rss_increase = current["peak_rss_kb"] - previous["peak_rss_kb"]
+    if rss_increase > max(previous["peak_rss_kb"] * threshold, config.get("import_regression_min_mb", IMPORT_REGRESSION_MIN_MB) * 1024):
+        regressions.append(
+            f"Peak RSS: {previous['peak_rss_kb'] / 1024:.0f} MB -> {current['peak_rss_kb'] / 1024:.0f} MB "
+            f"(+{rss_increase / max(previous['peak_rss_kb'], 1):.0%})"
+        )
+    return regressions
+
+def get_import_offenders(previous, current, limit=IMPORT_REGRESSION_TOP_MODULES):
+    """Get the modules whose own import time grew most, as (module, self before, self after, cumulative after) in us"""
+    offenders = []
+    for module, (self_us, cumulative_us) in current["modules"].items():
+        before = previous["modules"].get(module, [0, 0])[0]
+        if self_us > before:
+            offenders.append((module, before, self_us, cumulative_us))
+    offenders.sort(key=lambda offender: offender[2] - offender[1], reverse=True)
+    return offenders[:limit]
+
+def build_import_regression_issue(import_statement, commit, commit_info, previous, current, regressions):
+    """Build the title and body of the issue reporting an import time or memory regression"""
+    commit_date = format_commit_date(commit_info)
+    title = f"[{commit_date} {commit[:7]}] Import Regression Detected: {import_statement}"
+    offenders = "\n".join(
+        f"| `{module}` | {before / 1000:.1f} | {after / 1000:.1f} | +{(after - before) / 1000:.1f} | {cumulative / 1000:.1f} |"
+        for module, before, after, cumulative in get_import_offenders(previous, current)
+    )
+    regression_lines = "\n".join(f"- {regression}" for regression in regressions)
+    body = f"""## Import Regression Detected
+
+Import: `{import_statement}`
+Commit: [{commit}](https://github.com/ROCm/aiter/commit/{commit})
+Previous commit: {previous['commit']}
+Date: {commit_info.get('date', 'Unknown')}
+Author: {commit_info.get('author_name', 'Unknown')} <{commit_info.get('author_email', '')}>
+Message: {commit_info.get('message', 'No message')}
+
+### Regressions
+{regression_lines}
+
+### Top Offending Modules
+| Module | Self before (ms) | Self after (ms) | Change (ms) | Cumulative after (ms) |
+|:--|--:|--:|--:|--:|
+{offenders or '| (no module got slower) | | | | |'}
+"""
+    return title, body
+
+def check_import_profiles(config, commit, commit_info, current_signatures):
+    """Store the import profiles measured at a commit and report regressions against the previous ones"""
+    profiles = {}
+    for func_config in config["functions_to_monitor"]:
+        snapshot = current_signatures.get(func_config["function_path"]) or {}
+        if snapshot.get("import_profile"):
+            profiles[func_config["import_statement"]] = snapshot["import_profile"]
+
+    for import_statement, profile in profiles.items():
+        previous = get_last_import_profile(import_statement)
+        if previous is not None and previous["commit"] == commit:
+            continue
+        set_last_import_profile(commit, import_statement, profile)
+        if previous is None or previous["error"] or profile["error"]:
+            continue
+        regressions = find_import_regressions(config, previous, profile)
+        if regressions:
+            logger.info(f"Import regression detected for `{import_statement}`: {'; '.join(regressions)}")
+            title, body = build_import_regression_issue(import_statement, commit, commit_info, previous, profile, regressions)
+            queue_github_issue(config, title, body)
+
+def build_change_issue(func_config, commit, commit_info, previous_signature, current_signature, diff, mode_name=None):
+    """Build the title and body of the issue reporting an API change at a commit"""
+    function_path = func_config["function_path"]
+    import_statement = func_config["import_statement"]
+
+    commit_date = format_commit_date(commit_info)
+    short_commit = commit[:7]
+    heading = f"API Change Detected ({mode_name})" if mode_name else "API Change Detected"
+    title = f"[{commit_date} {short_commit}] {heading}: {function_path}"
+
+    body = f"""## {heading}
+
+Function: `{function_path}`
+Import: `{import_statement}`
+Commit: [{commit}](https://github.com/ROCm/aiter/commit/{commit})
+Date: {commit_info.get('date', 'Unknown')}
+Author: {commit_info.get('author_name', 'Unknown')} <{commit_info.get('author_email', '')}>
+Message: {commit_info.get('message', 'No message')}
+
+### Previous State
+Existed: {previous_signature.get('exists', False)}
+Signature: `{previous_signature.get('signature', 'N/A')}`
+
+### Current State
+Exists: {current_signature['exists']}
+Signature: `{current_signature.get('signature', 'N/A')}`
+
+{format_diff_section(diff)}
+
+### Error (if any)
+```
+{current_signature.get('error', 'No error')}
+```
+"""
+    return title, body
+
+def get_module_files(mirror_dir, commit, module_config):
+    """Get the (path, blob id) of every module file covered by a modules_to_monitor entry"""
+    base_path = module_config["module"].replace(".", "/")
+    result = subprocess.run(
+        ["git", "ls-tree", "-r", commit, "--", f"{base_path}.py", base_path],
+        cwd=mirror_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    include_submodules = module_config.get("include_submodules", True)
+    files = []
+    for line in result.stdout.splitlines():
+        info, path = line.split("\t", 1)
+        if not path.endswith(".py"):
+            continue
+        if path != f"{base_path}.py" and path != f"{base_path}/__init__.py":
+            relative_parts = path[len(base_path) + 1:].split("/")
+            if not include_submodules or any(part.startswith("_") and part != "__init__.py" for part in relative_parts):
+                continue
+        files.append((path, info.split()[2]))
+    return files
+
+def collect_module_surface(mirror_dir, commit, module_config):
+    """Get {qualified_name: record} for all public callables of a monitored module at a commit
+
+    Module files are parsed once per blob, so files unchanged since an earlier commit
+    are not parsed again.
+    """
+    surface = {}
+    reader = None
+    try:
+        for path, blob in get_module_files(mirror_dir, commit, module_config):
+            if blob not in MODULE_SURFACE_CACHE:
+                if reader is None:
+                    reader = GitSourceReader(mirror_dir, commit)
+                MODULE_SURFACE_CACHE[blob] = enumerate_module_callables(reader.read(path) or "")
+            module, _ = path_to_module(path)
+            for name, record in MODULE_SURFACE_CACHE[blob].items():
+                surface[f"{module}.{name}"] = record
+    finally:
+        if reader is not None:
+            reader.close()
+    return surface
+
+def diff_module_surfaces(config, module_config, previous_surface, current_surface):
+    """Diff two module surfaces, keeping the changes the notification rules report
+
+    Callables with an unchanged fingerprint are skipped without a parameter diff.
+    Returns {qualified_name: diff record}.
+    """
+    diffs = {}
+    for name in previous_surface.keys() | current_surface.keys():
+        previous = previous_surface.get(name)
+        current = current_surface.get(name)
+        if previous is not None and current is not None and previous["fingerprint"] == current["fingerprint"]:
+            continue
+        diff = diff_signatures(
+            dict(previous, exists=True) if previous is not None else {"exists": False},
+            dict(current, exists=True) if current is not None else {"exists": False}
+        )
+        if diff["status"] != "unchanged" and should_notify(config, module_config, diff):
+            diffs[name] = diff
+    return dict(sorted(diffs.items()))
+
+def build_surface_issue(module_config, commit, commit_info, diffs, mode_name=None):
+    """Build the title and body of the issue reporting changes of a module's API surface"""
+    module = module_config["module"]
+    commit_date = format_commit_date(commit_info)
+    heading = f"API Surface Change Detected ({mode_name})" if mode_name else "API Surface Change Detected"
+    title = f"[{commit_date} {commit[:7]}] {heading}: {module}"
+
+    sections = {"added": [], "removed": [], "changed": []}
+    for name, diff in diffs.items():
+        if diff["status"] == "changed":
+            changes = "; ".join(describe_change(change) for change in diff["changes"])
+            sections["changed"].append(f"- `{name}` ({diff['classification']}): {changes}")
+        else:
+            signature = diff["current_signature"] if diff["status"] == "added" else diff["previous_signature"]
+            sections[diff["status"]].append(f"- `{name}{signature or ''}`")
+
+    body = f"""## {heading}
+
+Module: `{module}`
+Commit: [{commit}](https://github.com/ROCm/aiter/commit/{commit})
+Date: {commit_info.get('date', 'Unknown')}
+Author: {commit_info.get('author_name', 'Unknown')} <{commit_info.get('author_email', '')}>
+Message: {commit_info.get('message', 'No message')}
+
+### Added Callables
+{chr(10).join(sections['added']) or 'None'}
+
+### Removed Callables
+{chr(10).join(sections['removed']) or 'None'}
+
+### Changed Callables
+{chr(10).join(sections['changed']) or 'None'}
+
+<details>
+<summary>Diff records</summary>
+
+```json
+{json.dumps(diffs, indent=2)}
+```
+</details>
+"""
+    return title, body
 
-    # Create a temporary directory for the repository
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Clone the repository to get commit history
-        subprocess.run(["git", "clone", config["repository_url"], temp_dir], check=True)
+def check_module_surfaces(config, mirror_dir, commit, commit_info, mode_name=None, current_surfaces=None):
+    """Compare the surface of every monitored module with its last surface and report changes
 
-        # Get commit history
-        start_commit = config.get("start_commit") or config.get("last_checked_commit")
-        if start_commit:
-            commits = get_commit_history(temp_dir, start_commit)
-            logger.info(f"Found {len(commits)} new commits since {start_commit}")
+    `current_surfaces` replaces collecting the surfaces from the mirror clone. Modules
+    missing from it are taken as unchanged.
+    """
+    for module_config in config.get("modules_to_monitor", []):
+        module = module_config["module"]
+        if current_surfaces is None:
+            current_surface = collect_module_surface(mirror_dir, commit, module_config)
+        elif module in current_surfaces:
+            current_surface = current_surfaces[module]
         else:
-            # If no start commit is specified, just check the latest
-            commits = [latest_commit]
-            logger.info(f"Checking only the latest commit {latest_commit}")
+            continue
+        previous_surface = get_last_surface(module_config)
+        if previous_surface != current_surface:
+            set_last_surface(commit, module_config, current_surface)
 
-        # Process each commit in chronological order (oldest first)
-        commits.reverse()
+        if previous_surface is None:
+            logger.info(f"Initial surface for {module}: {len(current_surface)} callables")
+            continue
+        diffs = diff_module_surfaces(config, module_config, previous_surface, current_surface)
+        if diffs:
+            logger.info(f"API surface change detected for {module}: {len(diffs)} callables")
+            title, body = build_surface_issue(module_config, commit, commit_info, diffs, mode_name)
+            queue_github_issue(config, title, body)
+        else:
+            logger.info(f"No reported API surface change for {module}")
 
-        for commit in commits:
-            logger.info(f"Checking commit {commit}")
-            commit_info = get_commit_info(temp_dir, commit)
-
-            # Create a new temporary directory for this commit
-            with tempfile.TemporaryDirectory() as commit_temp_dir:
-                try:
-                    # Clone the repository for this specific commit
-                    logger.info(f"Cloning repository for commit {commit}")
-                    subprocess.run(["git", "clone", "--recursive", config["repository_url"], commit_temp_dir], check=True)
-
-                    # Checkout the specific commit
-                    logger.info(f"Checking out commit {commit}")
-                    subprocess.run(["git", "checkout", commit], cwd=commit_temp_dir, check=True)
-
-                    # Update submodules
-                    logger.info("Updating submodules")
-                    subprocess.run(["git", "submodule", "sync"], cwd=commit_temp_dir, check=True)
-                    subprocess.run(["git", "submodule", "update", "--init", "--recursive"], cwd=commit_temp_dir, check=True)
-
-                    # Install aiter
-                    logger.info("Installing aiter package")
-                    try:
-                        subprocess.run([sys.executable, "setup.py", "develop"], cwd=commit_temp_dir, check=True)
-                        logger.info("Successfully installed aiter")
-                    except subprocess.CalledProcessError as e:
-                        logger.warning(f"Installation had issues, but continuing: {e}")
-
-                    # Check each function
-                    for func_config in config["functions_to_monitor"]:
-                        import_statement = func_config["import_statement"]
-                        function_path = func_config["function_path"]
-
-                        # Get the current signature using a separate process
-                        current_signature = check_function_in_subprocess(
-                            commit_temp_dir, 
-                            import_statement, 
-                            function_path
-                        )
-
-                        # Compare with the previous signature if it exists
-                        previous_signature = func_config.get("last_signature", {})
-
-                        if not previous_signature:
-                            # First time checking this function
-                            func_config["last_signature"] = current_signature
-                            logger.info(f"Initial signature for {function_path}: {current_signature.get('signature', 'Not available')}")
-                        elif (previous_signature.get("exists") != current_signature["exists"] or
-                              previous_signature.get("signature") != current_signature["signature"]):
-
-                            # Analyze parameter changes in detail
-                            param_changes = compare_parameters(
-                                previous_signature.get("parameters"), 
-                                current_signature.get("parameters")
-                            )
-
-                            # API has changed, create a GitHub issue
-                            commit_date = commit_info.get("date", "Unknown").split()[0]  # Only keep YYYY-MM-DD
-                            short_commit = commit[:7]
-                            title = f"[{commit_date} {short_commit}] API Change Detected: {function_path}"
-
-                            body = f"""## API Change Detected
+def compare_two_commits(config, mirror_dir, old_commit, new_commit):
+    """Compare two specific commits"""
+    old_signatures = collect_signatures(config, mirror_dir, old_commit)
+    new_signatures = collect_signatures(config, mirror_dir, new_commit)
+
+    for func_config in config["functions_to_monitor"]:
+        new_signature = new_signatures[func_config["function_path"]]
+
+        old_signature = old_signatures.get(func_config["function_path"], {})
+
+        diff = diff_signatures(old_signature, new_signature)
+        if diff["status"] != "unchanged":
+            logger.info(f"{diff['classification'].capitalize()} API change for {func_config['function_path']}")
+            if not should_notify(config, func_config, diff):
+                logger.info(f"Not reporting {diff['classification']} change of {func_config['function_path']}")
+                continue
+            commit_info = get_commit_info(mirror_dir, new_commit)
+            commit_date = format_commit_date(commit_info)
+            short_commit = new_commit[:7]
+            title = f"[{commit_date} {short_commit}] API Change Detected (Compare Mode): {func_config['function_path']}"
+            body = f"""## API Change Detected (Compare Mode)
+
+Function: `{func_config['function_path']}`
+Import: `{func_config['import_statement']}`
+Old Commit: {old_commit}
+New Commit: {new_commit}
+
+### Old Signature
+{old_signature.get('signature', 'N/A')}
+
+### New Signature
+{new_signature.get('signature', 'N/A')}
+
+{format_diff_section(diff)}
+
+### Error (if any)
+```
+{new_signature.get('error', 'No error')}
+```
+"""
+            queue_github_issue(config, title, body)
+        else:
+            logger.info(f"No API change for {func_config['function_path']} between {old_commit} and {new_commit}")
+
+    for module_config in config.get("modules_to_monitor", []):
+        diffs = diff_module_surfaces(
+            config, module_config,
+            collect_module_surface(mirror_dir, old_commit, module_config),
+            collect_module_surface(mirror_dir, new_commit, module_config)
+        )
+        if diffs:
+            commit_info = get_commit_info(mirror_dir, new_commit)
+            title, body = build_surface_issue(module_config, new_commit, commit_info, diffs, mode_name="Compare Mode")
+            queue_github_issue(config, title, body)
+        else:
+            logger.info(f"No reported API surface change for {module_config['module']} between {old_commit} and {new_commit}")
+
+def resolve_refs_in_mirror(mirror_dir, refs):
+    """Resolve branches, tags and commits to commit hashes with the mirror clone"""
+    result = subprocess.run(
+        ["git", "rev-parse"] + [f"{ref}^{{commit}}" for ref in refs],
+        cwd=mirror_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return dict(zip(refs, result.stdout.split()))
+
+MATRIX_CELLS = {"unchanged": "=", "compatible": "compatible", "breaking": "**breaking**", None: "?"}
+
+def build_compatibility_matrix(config, mirror_dir, refs):
+    """Inspect every ref once and diff every monitored function between every ordered pair of refs"""
+    commits = resolve_refs_in_mirror(mirror_dir, refs)
+    signatures, errors = {}, {}
+    unique_commits = list(dict.fromkeys(commits.values()))
+    for commit, commit_signatures, error in iter_commit_signatures(config, mirror_dir, unique_commits, strict=False):
+        if error is not None:
+            logger.error(f"Could not inspect commit {commit}: {error}")
+            errors[commit] = f"{type(error).__name__}: {error}"
+        else:
+            signatures[commit] = commit_signatures
+
+    matrix = {
+        "refs": [{"ref": ref, "commit": commits[ref], "error": errors.get(commits[ref])} for ref in refs],
+        "functions": {},
+        "summary": {}
+    }
+    for func_config in config["functions_to_monitor"]:
+        function_path = func_config["function_path"]
+        at_ref = {
+            ref: signatures[commits[ref]][function_path] if commits[ref] in signatures else None
+            for ref in refs
+        }
+        function_matrix = {
+            "signatures": {ref: snapshot and snapshot.get("signature") for ref, snapshot in at_ref.items()},
+            "diffs": {}
+        }
+        for old_ref, new_ref in itertools.permutations(refs, 2):
+            if at_ref[old_ref] is None or at_ref[new_ref] is None:
+                cell = {"classification": None, "changes": []}
+            else:
+                diff = diff_signatures(at_ref[old_ref], at_ref[new_ref])
+                cell = {"classification": diff["classification"] or "unchanged", "changes": diff["changes"]}
+            function_matrix["diffs"].setdefault(old_ref, {})[new_ref] = cell
+
+            summary = matrix["summary"].setdefault(old_ref, {}).setdefault(
+                new_ref, {"classification": "unchanged", "breaking": [], "compatible": []}
+            )
+            if cell["classification"] is None:
+                summary["classification"] = None
+            elif cell["classification"] != "unchanged":
+                summary[cell["classification"]].append(function_path)
+                if summary["classification"] is not None and summary["classification"] != "breaking":
+                    summary["classification"] = cell["classification"]
+        matrix["functions"][function_path] = function_matrix
+    return matrix
+
+def format_matrix_table(refs, cells):
+    """Render one from/to matrix as a Markdown table, `cells` giving the text of each ordered pair"""
+    lines = [
+        "| from \\ to | " + " | ".join(f"`{ref}`" for ref in refs) + " |",
+        "|:--|" + ":--|" * len(refs)
+    ]
+    for old_ref in refs:
+        row = ["" if old_ref == new_ref else cells(old_ref, new_ref) for new_ref in refs]
+        lines.append(f"| `{old_ref}` | " + " | ".join(row) + " |")
+    return "\n".join(lines)
+
+def format_matrix_markdown(matrix):
+    """Render a compatibility matrix as Markdown: an overall table, then one table per function"""
+    refs = [entry["ref"] for entry in matrix["refs"]]
+
+    def summary_cell(old_ref, new_ref):
+        summary = matrix["summary"][old_ref][new_ref]
+        text = MATRIX_CELLS[summary["classification"]]
+        if summary["breaking"] or summary["compatible"]:
+            text += f" ({len(summary['breaking'])} breaking, {len(summary['compatible'])} compatible)"
+        return text
+
+    lines = ["# API compatibility matrix", ""]
+    lines += [f"- `{entry['ref']}`: {entry['commit']}" + (" (inspection failed)" if entry["error"] else "") for entry in matrix["refs"]]
+    lines += ["", "Rows are the version code is written against, columns the version it runs on.", ""]
+    lines += [format_matrix_table(refs, summary_cell), ""]
+    for function_path, function_matrix in matrix["functions"].items():
+        lines += [f"## `{function_path}`", ""]
+        lines += [format_matrix_table(
+            refs, lambda old_ref, new_ref: MATRIX_CELLS[function_matrix["diffs"][old_ref][new_ref]["classification"]]
+        ), ""]
+        lines += [f"- `{ref}`: `{signature}`" for ref, signature in function_matrix["signatures"].items()]
+        lines.append("")
+    return "\n".join(lines)
+
+def compare_matrix(config, mirror_dir, refs):
+    """Build the compatibility matrix of a list of refs and write it as JSON and Markdown"""
+    matrix = build_compatibility_matrix(config, mirror_dir, refs)
+    output = config.get("compare_matrix_output") or COMPARE_MATRIX_OUTPUT
+    with open(f"{output}.json", 'w') as f:
+        json.dump(matrix, f, indent=2)
+    with open(f"{output}.md", 'w') as f:
+        f.write(format_matrix_markdown(matrix))
+    logger.info(f"Wrote the compatibility matrix of {len(refs)} refs to {output}.json and {output}.md")
+
+def get_first_parent_history(mirror_dir, old_commit, new_commit):
+    """Get the first-parent history from old_commit to new_commit, both included, oldest first"""
+    history = load_commit_metadata(mirror_dir, ["--first-parent", "--reverse", f"{old_commit}..{new_commit}"])
+    old_hash = subprocess.run(
+        ["git", "rev-parse", f"{old_commit}^{{commit}}"],
+        cwd=mirror_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout.strip()
+    return [old_hash] + history
+
+def bisect_commits(config, mirror_dir, old_commit, new_commit):
+    """Find the commits that changed each monitored signature between two commits
+
+    The endpoints are compared first, then the first-parent history is binary searched
+    for every function that changed. Ranges with several change points are split
+    recursively, and every inspected commit is shared by all functions.
+    """
+    ensure_commit_in_mirror(mirror_dir, old_commit)
+    ensure_commit_in_mirror(mirror_dir, new_commit)
+    history = get_first_parent_history(mirror_dir, old_commit, new_commit)
+    logger.info(f"Bisecting {len(history) - 1} first-parent commits between {old_commit} and {new_commit}")
+
+    inspected = {}
+
+    def signatures_at(index):
+        commit = history[index]
+        if commit not in inspected:
+            logger.info(f"Inspecting commit {commit} ({index}/{len(history) - 1})")
+            inspected[commit] = collect_signatures(config, mirror_dir, commit, strict=False)
+        return inspected[commit]
+
+    def find_change_points(low, high, function_path):
+        # The signature differs between history[low] and history[high]
+        if high - low == 1:
+            return [high]
+        middle = (low + high) // 2
+        change_points = []
+        if signature_changed(signatures_at(low)[function_path], signatures_at(middle)[function_path]):
+            change_points += find_change_points(low, middle, function_path)
+        if signature_changed(signatures_at(middle)[function_path], signatures_at(high)[function_path]):
+            change_points += find_change_points(middle, high, function_path)
+        return change_points
+
+    # Functions reported before an interruption are not reported again
+    origin = [old_commit, new_commit]
+    done = get_checkpoint(4, origin) or 0
+    if done:
+        logger.info(f"Resuming the interrupted bisection after {done} functions")
+
+    last = len(history) - 1
+    for index, func_config in enumerate(config["functions_to_monitor"]):
+        if index < done:
+            continue
+        commit_checkpoint(4, origin, index)
+        function_path = func_config["function_path"]
+        if last == 0 or not signature_changed(signatures_at(0)[function_path], signatures_at(last)[function_path]):
+            logger.info(f"No API change for {function_path} between {old_commit} and {new_commit}")
+            continue
+
+        for change_index in find_change_points(0, last, function_path):
+            commit = history[change_index]
+            logger.info(f"API change for {function_path} introduced by commit {commit}")
+            previous_signature = signatures_at(change_index - 1)[function_path]
+            current_signature = signatures_at(change_index)[function_path]
+            diff = diff_signatures(previous_signature, current_signature)
+            if not should_notify(config, func_config, diff):
+                logger.info(f"Not reporting {diff['classification']} change of {function_path}")
+                continue
+            commit_info = get_commit_info(mirror_dir, commit)
+            title, body = build_change_issue(
+                func_config, commit, commit_info, previous_signature, current_signature, diff,
+                mode_name="Bisect Mode"
+            )
+            queue_github_issue(config, title, body)
+
+    with STATE_DB:
+        clear_checkpoint()
+    spool_notifications()
+    logger.info(f"Inspected {len(inspected)} of {len(history)} commits")
+
+
+def process_commit_list(config, mirror_dir):
+    """Process a list of commits in order"""
+    commit_list = config["commit_list"]
+
+    if not commit_list:
+        logger.info("No commits specified in commit_list")
+        return
+
+    # Load the metadata of all listed commits at once
+    try:
+        load_commit_metadata(mirror_dir, ["--no-walk=unsorted"] + commit_list)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"Could not load commit metadata for the commit list: {e}")
+
+    # Resume an interrupted run of the same list after its last finished commit
+    done = get_checkpoint(2, commit_list) or 0
+    if done:
+        logger.info(f"Resuming the commit list after {done} of {len(commit_list)} commits")
+
+    # Process commits in order
+    remaining = iter_commit_signatures(config, mirror_dir, commit_list[done:])
+    for position, (commit, current_signatures, error) in enumerate(remaining, done + 1):
+        logger.info(f"Processing commit {commit}")
+        try:
+            if error is not None:
+                raise error
+
+            commit_info = get_commit_info(mirror_dir, commit)
+            commit_date = format_commit_date(commit_info)
+            short_commit = commit[:7]
+            record_commit(commit, commit_info)
+
+            for func_config in config["functions_to_monitor"]:
+                import_statement = func_config["import_statement"]
+                function_path = func_config["function_path"]
+
+                current_signature = current_signatures[function_path]
+
+                previous_signature = get_last_signature(func_config)
+
+                if not previous_signature:
+                    set_last_signature(commit, func_config, current_signature)
+                    logger.info(f"Initial signature for {function_path}: {current_signature.get('signature', 'Not available')}")
+                elif signature_changed(previous_signature, current_signature):
+                    diff = diff_signatures(previous_signature, current_signature)
+                    set_last_signature(commit, func_config, current_signature)
+                    logger.info(f"{diff['classification'].capitalize()} API change detected for {function_path}")
+                    if not should_notify(config, func_config, diff):
+                        logger.info(f"Not reporting {diff['classification']} change of {function_path}")
+                        continue
+
+                    title = f"[{commit_date} {short_commit}] API Change Detected: {function_path}"
+                    body = f"""## API Change Detected
 
 Function: `{function_path}`
 Import: `{import_statement}`
-Commit: [{commit}](https://github.com/ROCm/aiter/commit/{commit})
-Date: {commit_info.get('date', 'Unknown')}
-Author: {commit_info.get('author_name', 'Unknown')} <{commit_info.get('author_email', '')}>
-Message: {commit_info.get('message', 'No message')}
+Commit: {commit}
 
 ### Previous State
-Existed: {previous_signature.get('exists', False)}
-Signature: `{previous_signature.get('signature', 'N/A')}`
+{previous_signature.get('signature', 'N/A')}
 
 ### Current State
-Exists: {current_signature['exists']}
-Signature: `{current_signature.get('signature', 'N/A')}`
+{current_signature.get('signature', 'N/A')}
 
-### Parameter Changes
-{chr(10).join(f"- {change}" for change in param_changes)}
+{format_diff_section(diff)}
 
 ### Error (if any)
 ```
 {current_signature.get('error', 'No error')}
 ```
 """
-                            create_github_issue(title, body)
+                    queue_github_issue(config, title, body)
+                else:
+                    record_snapshot(commit, func_config, current_signature)
+                    logger.info(f"No API change for {function_path}")
+
+            check_import_profiles(config, commit, commit_info, current_signatures)
+            check_module_surfaces(config, mirror_dir, commit, commit_info)
+
+        except Exception as e:
+            STATE_DB.rollback()
+            logger.error(f"Error processing commit {commit}: {e}")
+            logger.error(traceback.format_exc())
+
+        # Everything recorded for a commit is written in one transaction with the position
+        commit_checkpoint(2, commit_list, position)
+
+    # After processing, remember the list as done and continue normal monitoring
+    with STATE_DB:
+        set_cursor("processed_commit_list", json.dumps(commit_list))
+        clear_checkpoint()
+    logger.info("Finished processing commit list. Resuming normal monitoring.")
+
+def check_commit_signatures(config, mirror_dir, commit, commit_info, current_signatures, current_surfaces=None):
+    """Compare the signatures of a checked commit with the last ones, record them and queue issues"""
+    record_commit(commit, commit_info)
+
+    # Check each function
+    for func_config in config["functions_to_monitor"]:
+        function_path = func_config["function_path"]
+
+        if function_path not in current_signatures:
+            # Replays only hold the functions that were inspected at the commit
+            continue
+        current_signature = current_signatures[function_path]
+
+        # Compare with the previous signature if it exists
+        previous_signature = get_last_signature(func_config)
+
+        if not previous_signature:
+            # First time checking this function
+            set_last_signature(commit, func_config, current_signature)
+            logger.info(f"Initial signature for {function_path}: {current_signature.get('signature', 'Not available')}")
+        elif signature_changed(previous_signature, current_signature):
+            diff = diff_signatures(previous_signature, current_signature)
+
+            # Update the signature
+            set_last_signature(commit, func_config, current_signature)
+            logger.info(f"{diff['classification'].capitalize()} API change detected for {function_path}")
+
+            # API has changed, create a GitHub issue if the notification rules allow it
+            if should_notify(config, func_config, diff):
+                title, body = build_change_issue(
+                    func_config, commit, commit_info, previous_signature, current_signature, diff
+                )
+                queue_github_issue(config, title, body)
+            else:
+                logger.info(f"Not reporting {diff['classification']} change of {function_path}")
+        else:
+            record_snapshot(commit, func_config, current_signature)
+            logger.info(f"No API change for {function_path}")
+
+    check_import_profiles(config, commit, commit_info, current_signatures)
+    check_module_surfaces(config, mirror_dir, commit, commit_info, current_surfaces=current_surfaces)
+
+def check_api_changes(config, latest_commit=None):
+    """Check for API changes in the monitored functions
+
+    `latest_commit` is the commit continuous monitoring checks up to. By default it is
+    the commit `ref` (default HEAD) of the repository points to.
+    """
+    prune_snapshot_cache(config)
+
+    # Mode 3: Compare two specific commits
+    if config.get("compare_pair"):
+        old_commit, new_commit = config["compare_pair"]
+        logger.info(f"Comparing two commits: {old_commit} -> {new_commit}")
+        mirror_dir = update_mirror(config)
+        with timed_stage("compare"):
+            compare_two_commits(config, mirror_dir, old_commit, new_commit)
+        commit_state()
+        return 3
+
+    # Mode 5: Compatibility matrix of a list of refs
+    if config.get("compare_matrix"):
+        logger.info(f"Building the compatibility matrix of {', '.join(config['compare_matrix'])}")
+        mirror_dir = update_mirror(config)
+        with timed_stage("compare_matrix"):
+            compare_matrix(config, mirror_dir, config["compare_matrix"])
+        return 5
+
+    # Mode 4: Find the commits that changed the signatures between two commits
+    if config.get("bisect_pair"):
+        old_commit, new_commit = config["bisect_pair"]
+        logger.info(f"Bisecting API changes: {old_commit} -> {new_commit}")
+        mirror_dir = update_mirror(config)
+        with timed_stage("bisect"):
+            bisect_commits(config, mirror_dir, old_commit, new_commit)
+        return 4
+
+    # Mode 2: Process a list of commits, once per list
+    if config.get("commit_list") and get_cursor("processed_commit_list") != json.dumps(config["commit_list"]):
+        logger.info(f"Processing specified commit list: {config['commit_list']}")
+        mirror_dir = update_mirror(config)
+        with timed_stage("commit_list"):
+            process_commit_list(config, mirror_dir)
+        return 2
+
+    # Default Mode 1: Monitor latest commits
+    latest_commit = latest_commit or get_latest_commit(config["repository_url"], config.get("ref", "HEAD"))
+
+    if not latest_commit:
+        logger.error("Failed to get latest commit")
+        return
+
+    # If we've already checked this commit, skip
+    last_checked_commit = get_cursor("last_checked_commit")
+    if last_checked_commit == latest_commit:
+        logger.info(f"No new commits since last check ({latest_commit})")
+        return
+
+    # Fetch the new commits into the mirror clone
+    mirror_dir = update_mirror(config)
+    ensure_commit_in_mirror(mirror_dir, latest_commit)
+
+    # Get commit history
+    start_commit = config.get("start_commit") or last_checked_commit
+    # Resume an interrupted scan from the same start after its last finished commit
+    resume_commit = get_checkpoint(1, start_commit)
+    if resume_commit:
+        logger.info(f"Resuming the interrupted scan from {start_commit} after commit {resume_commit}")
+        start_commit = resume_commit
+    if start_commit:
+        commits = get_commit_history(mirror_dir, start_commit, latest_commit)
+        logger.info(f"Found {len(commits)} new commits since {start_commit}")
+    else:
+        # If no start commit is specified, just check the latest
+        commits = [latest_commit]
+        logger.info(f"Checking only the latest commit {latest_commit}")
+
+    # Process each commit in chronological order (oldest first)
+    commits.reverse()
+
+    # Commits can only be skipped once every function has a known signature to carry forward
+    skip_irrelevant = config.get("skip_irrelevant_commits", True) and all(
+        get_cursor(f"last_signature:{func_config['function_path']}") for func_config in config["functions_to_monitor"]
+    ) and all(
+        get_cursor(f"last_surface:{module_config['module']}") for module_config in config.get("modules_to_monitor", [])
+    )
+    origin = config.get("start_commit") or last_checked_commit
+    previous_commit = start_commit
+    commits_to_check = []
+
+    for commit in commits:
+        if skip_irrelevant and previous_commit:
+            try:
+                if is_commit_irrelevant(config, mirror_dir, previous_commit, commit):
+                    logger.info(f"Skipping commit {commit}: no file in the import closure of the monitored functions changed")
+                    previous_commit = commit
+                    continue
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"Could not check whether commit {commit} is relevant: {e}")
+
+        commits_to_check.append(commit)
+        previous_commit = commit
+        # The first checked commit gives every function a signature to carry over skipped commits
+        skip_irrelevant = config.get("skip_irrelevant_commits", True)
+
+    for commit, current_signatures, error in iter_commit_signatures(config, mirror_dir, commits_to_check, strict=False):
+        logger.info(f"Checking commit {commit}")
+        commit_info = get_commit_info(mirror_dir, commit)
+
+        try:
+            if error is not None:
+                raise error
+
+            check_commit_signatures(config, mirror_dir, commit, commit_info, current_signatures)
+
+        except Exception as e:
+            STATE_DB.rollback()
+            logger.error(f"Error processing commit {commit}: {e}")
+            logger.error(traceback.format_exc())
+
+        # Everything recorded for a commit is written in one transaction with the position
+        commit_checkpoint(1, origin, commit)
+
+    skipped = len(commits) - len(commits_to_check)
+    CYCLE_COUNTERS["commits_skipped"] += skipped
+    if skipped:
+        logger.info(f"Skipped {skipped} of {len(commits)} commits that do not touch the monitored modules")
+
+    # Update the last checked commit
+    with STATE_DB:
+        set_cursor("last_checked_commit", latest_commit)
+        clear_checkpoint()
+    logger.info(f"Updated last checked commit to {latest_commit}")
+
+def get_repository_key(repo_url):
+    """Normalise a repository URL so the HTTPS, SSH and git forms of one repository compare equal"""
+    key = repo_url.strip().lower().rstrip("/")
+    if key.endswith(".git"):
+        key = key[:-len(".git")]
+    key = re.sub(r"^[a-z+]+://", "", key)
+    # Drop credentials and turn the scp-like `host:owner/repo` into `host/owner/repo`
+    key = re.sub(r"^[^/@]*@", "", key)
+    return re.sub(r"^([^/:]+):(?!\d)", r"\1/", key)
+
+def parse_push_event(payload):
+    """Get the repository, ref and commit range of a GitHub push webhook payload"""
+    repository = payload["repository"]
+    return {
+        "repositories": {
+            get_repository_key(repository[key])
+            for key in ("clone_url", "ssh_url", "git_url", "html_url") if repository.get(key)
+        },
+        "default_branch": repository.get("default_branch"),
+        "ref": payload["ref"],
+        "before": payload.get("before"),
+        "after": payload.get("after"),
+        "commits": len(payload.get("commits") or []),
+        "deleted": payload.get("deleted", False)
+    }
+
+def push_matches(push, config):
+    """Check whether a push moved the ref watched by a configuration"""
+    if push["deleted"] or get_repository_key(config["repository_url"]) not in push["repositories"]:
+        return False
+    ref = config.get("ref", "HEAD")
+    if ref == "HEAD":
+        return push["ref"] == f"refs/heads/{push['default_branch']}"
+    return push["ref"] in (ref, f"refs/heads/{ref}", f"refs/tags/{ref}")
+
+def sign_webhook_body(secret, body):
+    """Compute the X-Hub-Signature-256 header value of a webhook body"""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    """Accept GitHub push webhooks carrying a valid X-Hub-Signature-256"""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > WEBHOOK_MAX_BODY:
+            self.reply(413, "Payload too large")
+            return
+        body = self.rfile.read(length)
+        signature = self.headers.get("X-Hub-Signature-256") or ""
+        if not hmac.compare_digest(sign_webhook_body(self.server.secret, body), signature):
+            logger.warning(f"Rejected webhook from {self.client_address[0]}: invalid signature")
+            self.reply(401, "Invalid signature")
+            return
+
+        event = self.headers.get("X-GitHub-Event", "")
+        if event == "ping":
+            self.reply(200, "pong")
+            return
+        if event != "push":
+            self.reply(202, f"Ignored {event} event")
+            return
+        try:
+            push = parse_push_event(json.loads(body))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Rejected push webhook with an invalid payload: {e}")
+            self.reply(400, "Invalid payload")
+            return
+        self.server.on_push(push)
+        self.reply(202, "Queued")
+
+    def reply(self, status, message):
+        body = f"{message}\n".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Webhook listener: {format % args}")
+
+def get_webhook_address(config):
+    """Get the (host, port) the webhook listener binds to"""
+    host, _, port = config["webhook_listen"].rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+def start_webhook_listener(config, on_push):
+    """Start the push webhook listener in a background thread, returning the server or None
+
+    `on_push` is called from the listener thread with every verified push event.
+    """
+    if not config.get("webhook_listen"):
+        return None
+    secret = WEBHOOK_SECRET or config.get("webhook_secret")
+    if not secret:
+        logger.error("webhook_listen is set but no webhook secret is configured, not starting the webhook listener")
+        return None
+    try:
+        server = http.server.ThreadingHTTPServer(get_webhook_address(config), WebhookHandler)
+    except OSError as e:
+        logger.error(f"Could not listen for push webhooks on {config['webhook_listen']}, relying on polling: {e}")
+        return None
+    server.daemon_threads = True
+    server.secret = secret
+    server.on_push = on_push
+    threading.Thread(target=server.serve_forever, name="webhook-listener", daemon=True).start()
+    logger.info(f"Listening for push webhooks on {config['webhook_listen']}")
+    return server
+
+def log_push(push, matched):
+    """Log a received push event"""
+    before, after = (push["before"] or "")[:12], (push["after"] or "")[:12]
+    action = "queued a check" if matched else "not watched, ignored"
+    logger.info(f"Push to {push['ref']} ({before}..{after}, {push['commits']} commits): {action}")
+
+def wait_for_push(pushes, timeout, debounce):
+    """Sleep until the next poll is due or a push arrives, then let the burst of pushes settle"""
+    try:
+        pushes.get(timeout=timeout)
+    except queue.Empty:
+        return
+    count = 1
+    deadline = time.monotonic() + debounce
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            pushes.get(timeout=remaining)
+            count += 1
+        except queue.Empty:
+            break
+    logger.info(f"Checking after {count} push events")
+
+def post_webhook(config, payload_path, event="push"):
+    """Post a recorded webhook payload to the local listener, signed with the configured secret"""
+    host, port = get_webhook_address(config)
+    if host in ("0.0.0.0", "::", ""):
+        host = "127.0.0.1"
+    with open(payload_path, 'rb') as f:
+        body = f.read()
+    response = requests.post(
+        f"http://{host}:{port}/",
+        data=body,
+        headers={
+            "Content-Type": "application/json",
+            "X-GitHub-Event": event,
+            "X-GitHub-Delivery": f"local-{int(time.time())}",
+            "X-Hub-Signature-256": sign_webhook_body(WEBHOOK_SECRET or config.get("webhook_secret") or "", body)
+        },
+        timeout=30
+    )
+    logger.info(f"Webhook listener answered {response.status_code}: {response.text.strip()}")
+    return response.ok
+
+def format_interval(row):
+    """Turn a signature_intervals row into a dict with its snapshot"""
+    interval_id, function_path, snapshot_id, first_commit, first_date, last_commit, last_date, end_commit, end_date = row
+    snapshot = load_snapshot_record(snapshot_id)
+    return {
+        "id": interval_id,
+        "function_path": function_path,
+        "exists": snapshot.get("exists"),
+        "signature": snapshot.get("signature"),
+        "parameters": snapshot.get("parameters"),
+        "first_commit": first_commit,
+        "first_date": first_date,
+        "last_commit": last_commit,
+        "last_date": last_date,
+        "end_commit": end_commit,
+        "end_date": end_date
+    }
+
+INTERVAL_COLUMNS = (
+    "id, function_path, snapshot_id, first_commit, first_date, last_commit, last_date, end_commit, end_date"
+)
+
+def query_function_history(function_path=None, since=None, until=None):
+    """Get the signature intervals of one or all functions, optionally those starting in a date range"""
+    query = f"SELECT {INTERVAL_COLUMNS} FROM signature_intervals WHERE target = ?"
+    params = [STATE_NAMESPACE or ""]
+    if function_path:
+        query += " AND function_path = ?"
+        params.append(function_path)
+    if since:
+        query += " AND first_date >= ?"
+        params.append(since)
+    if until:
+        # A bare date includes the whole day
+        query += " AND first_date <= ?"
+        params.append(until if "T" in until else f"{until}T23:59:59Z")
+    query += " ORDER BY function_path, first_date, id"
+    return [format_interval(row) for row in STATE_DB.execute(query, params)]
+
+def query_signatures_at(commit, commit_date, function_path=None):
+    """Get the signature of every indexed function at a commit, from the interval covering it"""
+    query = (
+        f"SELECT {INTERVAL_COLUMNS} FROM signature_intervals WHERE target = ? "
+        "AND (first_commit = ? OR last_commit = ? OR (first_date <= ? AND (end_date IS NULL OR end_date > ?)))"
+    )
+    params = [STATE_NAMESPACE or "", commit, commit, commit_date, commit_date]
+    if function_path:
+        query += " AND function_path = ?"
+        params.append(function_path)
+    # An interval that starts or ends at the commit itself wins over one found by date
+    query += " ORDER BY function_path, first_commit = ? OR last_commit = ? DESC, first_date DESC"
+    intervals = {}
+    for row in STATE_DB.execute(query, params + [commit, commit]):
+        intervals.setdefault(row[1], format_interval(row))
+    return list(intervals.values())
+
+def resolve_query_commit(config, ref):
+    """Resolve a commit, branch or tag to (commit, date) with the mirror clone, or the state store"""
+    mirror_dir = get_mirror_dir(config)
+    if os.path.exists(os.path.join(mirror_dir, "HEAD")):
+        try:
+            loaded = load_commit_metadata(mirror_dir, ["-1", ref, "--"])
+            if loaded:
+                return loaded[0], utc_iso(COMMIT_INDEX[loaded[0]]["date"])
+        except subprocess.CalledProcessError:
+            pass
+    # Without a mirror only commits at the edge of an interval are known
+    row = STATE_DB.execute(
+        "SELECT first_commit, first_date FROM signature_intervals WHERE first_commit LIKE ? "
+        "UNION SELECT last_commit, last_date FROM signature_intervals WHERE last_commit LIKE ? LIMIT 1",
+        (f"{ref}%", f"{ref}%")
+    ).fetchone()
+    return (row[0], row[1]) if row else (None, None)
 
-                            # Update the signature
-                            func_config["last_signature"] = current_signature
-                            logger.info(f"API change detected for {function_path}")
-                        else:
-                            logger.info(f"No API change for {function_path}")
+def build_changelog(function_paths=None):
+    """Build the API changelog of the indexed functions as {function_path: [change points]}"""
+    changelog = {}
+    for interval in query_function_history():
+        if function_paths and interval["function_path"] not in function_paths:
+            continue
+        entries = changelog.setdefault(interval["function_path"], [])
+        previous = entries[-1] if entries else None
+        diff = diff_signatures(previous, interval) if previous else None
+        entries.append({
+            "commit": interval["first_commit"],
+            "date": interval["first_date"],
+            "exists": interval["exists"],
+            "signature": interval["signature"],
+            "parameters": interval["parameters"],
+            "classification": diff["classification"] if diff else "initial",
+            "changes": diff["changes"] if diff else [],
+            "last_commit": interval["last_commit"],
+            "end_commit": interval["end_commit"]
+        })
+    return changelog
 
-                except Exception as e:
-                    logger.error(f"Error processing commit {commit}: {e}")
-                    logger.error(traceback.format_exc())
+def format_changelog_markdown(changelog):
+    """Render an API changelog as Markdown"""
+    lines = ["# API changelog", ""]
+    for function_path, entries in sorted(changelog.items()):
+        lines += [f"## `{function_path}`", ""]
+        for entry in reversed(entries):
+            state = f"`{entry['signature']}`" if entry["exists"] else "not available"
+            lines.append(f"- **{entry['date'][:10]}** `{entry['commit'][:7]}` ({entry['classification']}): {state}")
+            lines += [f"  - {describe_change(change)}" for change in entry["changes"]]
+        lines.append("")
+    return "\n".join(lines)
 
-        # Update the last checked commit
-        config["last_checked_commit"] = latest_commit
-        save_config(config)
-        logger.info(f"Updated last checked commit to {latest_commit}")
+def format_interval_table(intervals):
+    """Format signature intervals as plain text lines for the query command"""
+    lines = []
+    for interval in intervals:
+        end = f"{interval['end_commit'][:7]} {interval['end_date'][:10]}" if interval["end_commit"] else "now"
+        state = interval["signature"] if interval["exists"] else "(not available)"
+        lines.append(
+            f"{interval['function_path']}  {interval['first_commit'][:7]} {interval['first_date'][:10]}"
+            f" .. {interval['last_commit'][:7]} {interval['last_date'][:10]}  (until {end})  {state}"
+        )
+    return "\n".join(lines)
+
+def load_command_config(args):
+    """Load the configuration of a command, of its watch target if one is given, and open the state store"""
+    global STATE_NAMESPACE
+    config = load_config()
+    if args.target:
+        targets = {target["name"]: target for target in config.get("watch_targets", [])}
+        config = get_target_config(config, targets[args.target])
+        STATE_NAMESPACE = args.target
+    apply_global_config(config)
+    open_state_store(config)
+    return config
+
+def run_query(args):
+    """Answer a history query from the state store and print the result"""
+    config = load_command_config(args)
+
+    if args.command == "changelog":
+        changelog = build_changelog(args.function)
+        output = json.dumps(changelog, indent=2) if args.format == "json" else format_changelog_markdown(changelog)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + "\n")
+            logger.info(f"Wrote API changelog of {len(changelog)} functions to {args.output}")
+        else:
+            print(output)
+        return True
+
+    function_path = args.function[0] if args.function else None
+    if args.at:
+        commit, commit_date = resolve_query_commit(config, args.at)
+        if commit is None:
+            logger.error(f"Unknown commit {args.at}")
+            return False
+        intervals = query_signatures_at(commit, commit_date, function_path)
+    else:
+        intervals = query_function_history(function_path, args.since, args.until)
+    print(json.dumps(intervals, indent=2) if args.json else format_interval_table(intervals))
+    return True
+
+def load_replay_history(since=None, until=None):
+    """Load the commits checked by this watch target with their stored inspection results, in commit date order
+
+    Commits recorded before targets were remembered belong to the configuration
+    without watch targets.
+    """
+    query = "SELECT commit_hash, info FROM commits WHERE (commit_hash IN (SELECT commit_hash FROM commit_targets WHERE target = ?)"
+    if not STATE_NAMESPACE:
+        query += " OR commit_hash NOT IN (SELECT commit_hash FROM commit_targets)"
+    query += ")"
+    params = [STATE_NAMESPACE or ""]
+    if since:
+        query += " AND date >= ?"
+        params.append(since)
+    if until:
+        query += " AND date <= ?"
+        params.append(until if "T" in until else f"{until}T23:59:59Z")
+    history = []
+    for commit, info in STATE_DB.execute(query + " ORDER BY date, rowid", params).fetchall():
+        signatures = {
+            function_path: load_snapshot_record(snapshot_id)
+            for function_path, snapshot_id in STATE_DB.execute(
+                "SELECT function_path, id FROM snapshots WHERE commit_hash = ?", (commit,)
+            )
+        }
+        surfaces = {
+            module: json.loads(load_blob(surface_hash))
+            for module, surface_hash in STATE_DB.execute(
+                "SELECT module, surface_hash FROM surfaces WHERE commit_hash = ?", (commit,)
+            )
+        }
+        history.append((commit, json.loads(info), signatures, surfaces))
+    return history
+
+def replay_history(config, output_dir, since=None, until=None):
+    """Feed the stored inspection results through the comparison and notification pipeline
+
+    Nothing touches git, a build or the network: the would-be issues are written to
+    `output_dir` in the outbox format and never sent, and the comparison state lives
+    in an in-memory store, so the real cursors are left alone.
+    """
+    global STATE_DB
+    start = time.perf_counter()
+    history = load_replay_history(since, until)
+    source_db = STATE_DB
+    STATE_DB = sqlite3.connect(":memory:")
+    STATE_DB.executescript(STATE_SCHEMA)
+    replay_config = dict(config, notification_outbox_dir=output_dir)
+    issues_before = CYCLE_COUNTERS["issues_queued"]
+    try:
+        for commit, commit_info, signatures, surfaces in history:
+            logger.info(f"Replaying commit {commit}")
+            COMMIT_INDEX.setdefault(commit, commit_info)
+            check_commit_signatures(replay_config, None, commit, commit_info, signatures, surfaces)
+            commit_state()
+    finally:
+        STATE_DB.close()
+        STATE_DB = source_db
+    issues = CYCLE_COUNTERS["issues_queued"] - issues_before
+    logger.info(
+        f"Replayed {len(history)} commits in {time.perf_counter() - start:.1f}s, "
+        f"wrote {issues} would-be issues to {output_dir}"
+    )
+
+def run_replay(args):
+    """Replay the stored inspection results into a dry-run directory"""
+    config = load_command_config(args)
+    replay_history(config, args.output, args.since, args.until)
+    return True
+
+def apply_global_config(config):
+    """Set the module-level settings that are read from the configuration"""
+    global NOTIFICATION_REPO, GITHUB_API_URL
+    NOTIFICATION_REPO = config.get("notification_repo", "EmbeddedLLM/aiter-api-watcher")
+    GITHUB_API_URL = config.get("github_api_url", GITHUB_API_URL).rstrip("/")
+
+def run_cycle(config, latest_commit=None):
+    """Run one check cycle with its run record, notifications and metrics, returning the mode"""
+    run_id = start_run()
+    reset_metrics()
+    cycle_start = time.perf_counter()
+    mode, error = None, None
+    try:
+        with use_mirror(config):
+            mode = check_api_changes(config, latest_commit)
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if error:
+            # The unfinished commit is redone from its checkpoint on the next cycle
+            STATE_DB.rollback()
+        finish_run(run_id, mode, error)
+        stop_inspection_server()
+        # Issues of the commits finished before a failure are still delivered
+        spool_notifications()
+        flush_notifications(config)
+        report_cycle_metrics(config, run_id, mode, error, time.perf_counter() - cycle_start)
+    return mode
+
+def get_target_config(config, target):
+    """Build the configuration of one watch target on top of the shared configuration"""
+    target_config = {
+        key: value for key, value in config.items()
+        if key not in ("watch_targets", "commit_list", "compare_pair", "bisect_pair", "compare_matrix")
+    }
+    target_config.update(target)
+    target_config.setdefault("ref", "HEAD")
+    # Every target keeps its own metrics textfile
+    textfile = target_config.get("metrics_textfile", METRICS_TEXTFILE)
+    if textfile and "metrics_textfile" not in target:
+        root, extension = os.path.splitext(textfile)
+        target_config["metrics_textfile"] = f"{root}_{target['name']}{extension}"
+    return target_config
+
+def run_target_check(target_name, latest_commit):
+    """Run one check cycle of a watch target, in the process started by the scheduler"""
+    global STATE_NAMESPACE
+    config = load_config()
+    targets = {target["name"]: target for target in config.get("watch_targets", [])}
+    target_config = get_target_config(config, targets[target_name])
+    apply_global_config(target_config)
+    STATE_NAMESPACE = target_name
+    open_state_store(target_config)
+    logger.info(f"Checking watch target {target_name} ({target_config['repository_url']} {target_config['ref']})")
+    try:
+        run_cycle(target_config, latest_commit)
+        return True
+    except Exception as e:
+        logger.error(f"Error checking watch target {target_name}: {e}")
+        logger.error(traceback.format_exc())
+        return False
+
+async def run_target_check_process(target_config, latest_commit, semaphore):
+    """Check a watch target in its own process, returning whether the check succeeded"""
+    name = target_config["name"]
+    timeout = target_config.get("check_timeout_seconds") or None
+    async with semaphore:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--check-target", name, "--commit", latest_commit
+        )
+        try:
+            return await asyncio.wait_for(process.wait(), timeout) == 0
+        except asyncio.TimeoutError:
+            logger.error(f"Check of watch target {name} timed out after {timeout} seconds")
+            process.kill()
+            await process.wait()
+            return False
+
+async def poll_target_group(repo_url, targets, semaphore, schedule):
+    """Resolve the refs of targets sharing a remote with one ls-remote, then check the targets that moved"""
+    try:
+        refs = await asyncio.to_thread(resolve_remote_refs, repo_url, [t["ref"] for t in targets])
+    except Exception as e:
+        logger.error(f"Failed to list the refs of {repo_url}: {e}")
+        for target_config in targets:
+            schedule(target_config["name"], False)
+        return
+
+    async def check(target_config):
+        name = target_config["name"]
+        ok = False
+        try:
+            latest_commit = refs.get(target_config["ref"])
+            if latest_commit is None:
+                logger.error(f"Ref {target_config['ref']} of watch target {name} not found in {repo_url}")
+            elif latest_commit == get_cursor(f"{name}/last_checked_commit"):
+                logger.info(f"No new commits for watch target {name} ({latest_commit})")
+                ok = True
+            else:
+                ok = await run_target_check_process(target_config, latest_commit, semaphore)
+        finally:
+            schedule(name, ok)
+
+    await asyncio.gather(*(check(target_config) for target_config in targets))
+
+async def run_scheduler(config):
+    """Poll every watch target on its own interval and check the targets whose ref moved
+
+    Due targets of the same remote share one `git ls-remote`. Checks run in separate
+    processes, at most max_concurrent_checks at a time, and a slow target only holds
+    back its own next check. Failed targets are retried with exponential backoff, and
+    every delay gets a random jitter.
+    """
+    targets = {target["name"]: get_target_config(config, target) for target in config["watch_targets"]}
+    semaphore = asyncio.Semaphore(config.get("max_concurrent_checks", MAX_CONCURRENT_CHECKS))
+    jitter = config.get("schedule_jitter", SCHEDULE_JITTER)
+    backoff = config.get("failure_backoff_seconds", FAILURE_BACKOFF)
+    debounce = config.get("webhook_debounce_seconds", WEBHOOK_DEBOUNCE)
+    next_due = {name: time.monotonic() for name in targets}
+    failures = collections.Counter()
+    busy = set()
+    pushed = set()
+    tasks = set()
+    wake = asyncio.Event()
+
+    def schedule(name, ok):
+        interval = targets[name].get("check_interval_seconds", CHECK_INTERVAL)
+        if ok:
+            failures[name] = 0
+            delay = interval
+        else:
+            failures[name] += 1
+            delay = min(backoff * 2 ** (failures[name] - 1), interval)
+        delay *= 1 + random.uniform(-jitter, jitter)
+        if name in pushed:
+            # A push arrived while the target was being checked
+            pushed.discard(name)
+            delay = min(delay, debounce)
+        next_due[name] = time.monotonic() + delay
+        busy.discard(name)
+        wake.set()
+        logger.info(f"Next check of watch target {name} in {delay:.0f} seconds")
+
+    def trigger(push):
+        matched = [name for name, target_config in targets.items() if push_matches(push, target_config)]
+        log_push(push, bool(matched))
+        for name in matched:
+            if name in busy:
+                pushed.add(name)
+            else:
+                # Pushes within the debounce window are coalesced into one check
+                next_due[name] = min(next_due[name], time.monotonic() + debounce)
+        wake.set()
+
+    loop = asyncio.get_running_loop()
+    start_webhook_listener(config, lambda push: loop.call_soon_threadsafe(trigger, push))
+
+    logger.info(f"Watching {len(targets)} targets: {', '.join(targets)}")
+    while True:
+        now = time.monotonic()
+        groups = collections.defaultdict(list)
+        for name, target_config in targets.items():
+            if name not in busy and next_due[name] <= now:
+                busy.add(name)
+                groups[target_config["repository_url"]].append(target_config)
+        for repo_url, group in groups.items():
+            task = asyncio.create_task(poll_target_group(repo_url, group, semaphore, schedule))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        idle = [next_due[name] for name in targets if name not in busy]
+        timeout = max(min(idle) - time.monotonic(), 0) if idle else None
+        wake.clear()
+        try:
+            await asyncio.wait_for(wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
 def main_loop():
     """Main loop to periodically check for API changes"""
     config = load_config()
     check_interval = config.get("check_interval_seconds", CHECK_INTERVAL)
-    global NOTIFICATION_REPO
-    NOTIFICATION_REPO = config.get("notification_repo", "EmbeddedLLM/aiter-api-watcher")
+    apply_global_config(config)
+    open_state_store(config)
+    migrate_config_state(config)
+
+    if config.get("watch_targets"):
+        try:
+            asyncio.run(run_scheduler(config))
+        except KeyboardInterrupt:
+            logger.info("Stopping aiter API watcher")
+        return
 
     logger.info("Starting aiter API watcher")
     logger.info(f"Monitoring {len(config['functions_to_monitor'])} functions")
     logger.info(f"Check interval: {check_interval} seconds")
 
+    pushes = queue.Queue()
+
+    def on_push(push):
+        matched = push_matches(push, config)
+        log_push(push, matched)
+        if matched:
+            pushes.put(push)
+
+    start_webhook_listener(config, on_push)
+    debounce = config.get("webhook_debounce_seconds", WEBHOOK_DEBOUNCE)
+
     while True:
         try:
             logger.info("Checking for API changes...")
-            mode = check_api_changes(config)
+            mode = run_cycle(config)
             if mode == 3:
                 logger.info("Exiting after comparing two commits")
                 break
+            if mode == 4:
+                logger.info("Exiting after bisecting API changes")
+                break
+            if mode == 5:
+                logger.info("Exiting after building the compatibility matrix")
+                break
             logger.info(f"Next check in {check_interval} seconds")
-            time.sleep(check_interval)
+            # Polling stays as the safety net for missed webhooks
+            wait_for_push(pushes, check_interval, debounce)
         except KeyboardInterrupt:
             logger.info("Stopping aiter API watcher")
             break
@@ -637,4 +4570,36 @@ def main_loop():
             time.sleep(60)
 
 if __name__ == "__main__":
-    main_loop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Watch aiter for API changes")
+    # Used by the scheduler to check one watch target in a separate process
+    parser.add_argument("--check-target", help=argparse.SUPPRESS)
+    parser.add_argument("--commit", help=argparse.SUPPRESS)
+    parser.add_argument("--post-webhook", metavar="PAYLOAD", help="Post a recorded webhook payload to the running listener and exit")
+    parser.add_argument("--event", default="push", help="X-GitHub-Event of the payload posted with --post-webhook")
+    commands = parser.add_subparsers(dest="command")
+    query_parser = commands.add_parser("query", help="Query the signature history index")
+    query_parser.add_argument("--function", action="append", help="Function path to query")
+    query_parser.add_argument("--at", metavar="COMMIT", help="Signatures at a commit, branch or tag")
+    query_parser.add_argument("--since", help="Only changes on or after this ISO date")
+    query_parser.add_argument("--until", help="Only changes on or before this ISO date")
+    query_parser.add_argument("--json", action="store_true", help="Print the intervals as JSON")
+    changelog_parser = commands.add_parser("changelog", help="Export the per-function API changelog")
+    changelog_parser.add_argument("--function", action="append", help="Function path to include (default: all)")
+    changelog_parser.add_argument("--format", choices=["markdown", "json"], default="markdown", help="Output format")
+    changelog_parser.add_argument("--output", help="Write the changelog to this file instead of stdout")
+    replay_parser = commands.add_parser("replay", help="Re-run the comparison over stored inspection results")
+    replay_parser.add_argument("--output", required=True, help="Directory to write the would-be issues to")
+    replay_parser.add_argument("--since", help="Only commits on or after this ISO date")
+    replay_parser.add_argument("--until", help="Only commits on or before this ISO date")
+    for command_parser in (query_parser, changelog_parser, replay_parser):
+        command_parser.add_argument("--target", help="Watch target whose history to use")
+    args = parser.parse_args()
+    if args.check_target:
+        sys.exit(0 if run_target_check(args.check_target, args.commit) else 1)
+    if args.command == "replay":
+        sys.exit(0 if run_replay(args) else 1)
+    if args.command:
+        sys.exit(0 if run_query(args) else 1)
+    if args.post_webhook:
+        sys.exit(0 if post_webhook(load_config(), args.post_webhook, args.event) else 1)
+    main_loop()
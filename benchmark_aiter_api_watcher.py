@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import tempfile
+import shutil
+
+WATCHER_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ["latest", "commit_list", "compare_pair"]
+# Fixed dates keep the generated commit hashes the same across runs
+COMMIT_EPOCH = 1700000000
+
+# Submodules are cloned over file://, which git refuses by default
+GIT_FILE_PROTOCOL_ENV = {
+    "GIT_CONFIG_COUNT": "1",
+    "GIT_CONFIG_KEY_0": "protocol.file.allow",
+    "GIT_CONFIG_VALUE_0": "always"
+}
+
+
+def git(repo_dir, *args, commit_index=0):
+    """Run a git command in the synthetic repository with fixed author data"""
+    date = f"{COMMIT_EPOCH + commit_index * 60} +0000"
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME="Benchmark", GIT_AUTHOR_EMAIL="benchmark@example.com", GIT_AUTHOR_DATE=date,
+        GIT_COMMITTER_NAME="Benchmark", GIT_COMMITTER_EMAIL="benchmark@example.com", GIT_COMMITTER_DATE=date,
+        **GIT_FILE_PROTOCOL_ENV
+    )
+    return subprocess.run(
+        ["git"] + list(args), cwd=repo_dir, env=env, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def write_file(repo_dir, path, content):
+    """Write a file of the synthetic repository"""
+    full_path = os.path.join(repo_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+def render_module(functions):
+    """Render an ops module from {function name: [parameter names]}"""
+    lines = ["from typing import Optional", ""]
+    for name, params in sorted(functions.items()):
+        rendered = ", ".join(
+            [params[0], params[1]] + [f"{param}: Optional[int] = None" for param in params[2:]]
+        )
+        lines += [f"def {name}({rendered}):", f"    return {params[0]}", ""]
+    return "\n".join(lines)
+
+
+def generate_repository(work_dir, args):
+    """Generate an aiter-like git repository with a submodule and a history of signature churn"""
+    rng = random.Random(args.seed)
+
+    submodule_dir = os.path.join(work_dir, "composable_kernel")
+    os.makedirs(submodule_dir)
+    git(submodule_dir, "init", "-q", "-b", "main")
+    write_file(submodule_dir, "include/ck.hpp", "#pragma once\n")
+    git(submodule_dir, "add", "-A")
+    git(submodule_dir, "commit", "-q", "-m", "ck")
+
+    repo_dir = os.path.join(work_dir, "aiter")
+    os.makedirs(repo_dir)
+    git(repo_dir, "init", "-q", "-b", "main")
+    write_file(repo_dir, "setup.py", (
+        "import sys\n"
+        "import time\n"
+        f"time.sleep({args.build_delay})\n"
+        "print('fake build', sys.argv[1:])\n"
+    ))
+    write_file(repo_dir, "csrc/kernels.cpp", "int main() { return 0; }\n")
+
+    modules = {
+        f"mod_{m}": {f"op_{m}_{f}": ["input", "weight", "bias"] for f in range(args.functions)}
+        for m in range(args.modules)
+    }
+    write_file(repo_dir, "aiter/__init__.py", "".join(f"from .ops.{module} import *\n" for module in modules))
+    write_file(repo_dir, "aiter/ops/__init__.py", "")
+    for module, functions in modules.items():
+        write_file(repo_dir, f"aiter/ops/{module}.py", render_module(functions))
+    # A relative URL keeps the work directory out of .gitmodules, and so out of the commit hashes
+    git(repo_dir, "-c", "protocol.file.allow=always", "submodule", "add", "-q",
+        "../composable_kernel", "3rdparty/composable_kernel")
+    git(repo_dir, "add", "-A")
+    git(repo_dir, "commit", "-q", "-m", "Initial aiter layout")
+
+    parameter_count = 0
+    for index in range(1, args.commits):
+        if rng.random() < args.churn:
+            # Signature change: add a keyword parameter to a random function
+            module = rng.choice(sorted(modules))
+            function = rng.choice(sorted(modules[module]))
+            parameter_count += 1
+            modules[module][function].append(f"extra_{parameter_count}")
+            write_file(repo_dir, f"aiter/ops/{module}.py", render_module(modules[module]))
+            message = f"Add a parameter to {function}"
+        elif rng.random() < 0.5:
+            # Kernel-only change, invisible to the Python API
+            with open(os.path.join(repo_dir, "csrc/kernels.cpp"), 'a') as f:
+                f.write(f"// change {index}\n")
+            message = f"Tune kernels ({index})"
+        else:
+            # Python change that keeps every signature
+            module = rng.choice(sorted(modules))
+            with open(os.path.join(repo_dir, f"aiter/ops/{module}.py"), 'a') as f:
+                f.write(f"\n_TUNING_{index} = {index}\n")
+            message = f"Update tuning table of {module} ({index})"
+        git(repo_dir, "commit", "-q", "-a", "-m", message, commit_index=index)
+
+    commits = git(repo_dir, "rev-list", "--reverse", "HEAD").split()
+    monitored = [
+        {"import_statement": f"from aiter.ops.{module} import {function}", "function_path": function}
+        for module, functions in sorted(modules.items())
+        for function in sorted(functions)[:args.monitored_per_module]
+    ]
+    return repo_dir, commits, monitored
+
+
+def build_config(args, run_dir, repo_dir, commits, monitored, mode):
+    """Build the watcher configuration for one benchmarked mode"""
+    config = {
+        "functions_to_monitor": monitored,
+        "check_interval_seconds": 3600,
+        "start_commit": "",
+        "repository_url": f"file://{repo_dir}",
+        "notification_repo": "benchmark/benchmark",
+        "commit_list": [],
+        "compare_pair": [],
+        "bisect_pair": [],
+        "mirror_cache_dir": os.path.join(run_dir, "mirrors"),
+        "snapshot_cache_dir": os.path.join(run_dir, "snapshots"),
+        "build_cache_dir": os.path.join(run_dir, "builds"),
+        "notification_outbox_dir": os.path.join(run_dir, "outbox"),
+        "state_db": os.path.join(run_dir, "state.db"),
+        "signature_extractor": args.extractor,
+        "parallel_workers": args.workers
+    }
+    if mode == "latest":
+        config["start_commit"] = commits[0]
+    elif mode == "commit_list":
+        config["commit_list"] = commits
+    else:
+        config["compare_pair"] = [commits[0], commits[-1]]
+    return config
+
+
+def run_mode(run_dir):
+    """Run check_api_changes once in this process and print its measurements as JSON"""
+    os.chdir(run_dir)
+    sys.path.insert(0, WATCHER_DIR)
+    import aiter_api_watcher
+
+    with open(aiter_api_watcher.CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    aiter_api_watcher.GITHUB_TOKEN = None
+    aiter_api_watcher.open_state_store(config)
+
+    start = time.perf_counter()
+    aiter_api_watcher.check_api_changes(config)
+    wall_time = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    outbox_dir = config["notification_outbox_dir"]
+    issues = len([n for n in os.listdir(outbox_dir) if n.endswith(".json") and n[0].isdigit()]) if os.path.isdir(outbox_dir) else 0
+    print(json.dumps({"wall_seconds": wall_time, "peak_rss_mb": peak_rss_kb / 1024, "issues": issues}))
+
+
+def benchmark(args):
+    """Generate the repository, run every requested mode in a fresh process and collect the results"""
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="aiter_watcher_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        repo_dir, commits, monitored = generate_repository(work_dir, args)
+        generation_time = time.perf_counter() - start
+
+        try:
+            watcher_commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"], cwd=WATCHER_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            watcher_commit = None
+
+        results = {
+            "watcher_commit": watcher_commit,
+            "python": sys.version.split()[0],
+            "parameters": {
+                "commits": args.commits,
+                "modules": args.modules,
+                "functions_per_module": args.functions,
+                "monitored_functions": len(monitored),
+                "churn": args.churn,
+                "build_delay_seconds": args.build_delay,
+                "extractor": args.extractor,
+                "workers": args.workers,
+                "seed": args.seed
+            },
+            "generation_seconds": generation_time,
+            "modes": {}
+        }
+
+        for mode in args.modes:
+            run_dir = os.path.join(work_dir, f"run_{mode}")
+            os.makedirs(run_dir, exist_ok=True)
+            config = build_config(args, run_dir, repo_dir, commits, monitored, mode)
+            with open(os.path.join(run_dir, "aiter_api_watcher_config.json"), 'w') as f:
+                json.dump(config, f, indent=2)
+
+            print(f"Running mode {mode}...", file=sys.stderr)
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-mode", run_dir],
+                env=dict(os.environ, **GIT_FILE_PROTOCOL_ENV),
+                capture_output=True,
+                text=True
+            )
+            if result.returncode != 0:
+                raise RuntimeError(f"Mode {mode} failed:\n{result.stderr[-4000:]}")
+            measurement = json.loads(result.stdout.strip().splitlines()[-1])
+            # Continuous monitoring starts after start_commit
+            inspected_commits = {"latest": len(commits) - 1, "commit_list": len(commits), "compare_pair": 2}[mode]
+            measurement["commits"] = inspected_commits
+            measurement["seconds_per_commit"] = measurement["wall_seconds"] / inspected_commits
+            results["modes"][mode] = measurement
+
+        return results
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the aiter API watcher on a synthetic aiter-like repository")
+    parser.add_argument("--commits", type=int, default=50, help="Number of commits in the generated history")
+    parser.add_argument("--modules", type=int, default=8, help="Number of ops modules")
+    parser.add_argument("--functions", type=int, default=25, help="Number of functions per module")
+    parser.add_argument("--monitored-per-module", type=int, default=2, help="Functions of each module to monitor")
+    parser.add_argument("--churn", type=float, default=0.1, help="Share of commits that change a signature")
+    parser.add_argument("--build-delay", type=float, default=0.5, help="Seconds the fake setup.py sleeps")
+    parser.add_argument("--extractor", choices=["import", "static"], default="import", help="signature_extractor to use")
+    parser.add_argument("--workers", type=int, default=1, help="parallel_workers to use")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="Modes to run")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated history")
+    parser.add_argument("--work-dir", help="Directory for the repository and runs (kept afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.run_mode)
+        return
+
+    results = benchmark(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
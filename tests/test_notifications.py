@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+import http.server
+from email.utils import formatdate
+
+import pytest
+
+import aiter_api_watcher as watcher
+
+
+class StandInGitHub(http.server.ThreadingHTTPServer):
+    """A local stand-in for the GitHub issues API
+
+    `scripted` holds (method, status, headers) answers that are sent, in order, before
+    the normal behaviour. With `hang_after_create` a POST creates the issue and then
+    answers too late for the client.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.issues = []
+        self.requests = []
+        self.scripted = []
+        self.hang_after_create = 0
+        self.release = threading.Event()
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def scripted_answer(self, method):
+        for index, (scripted_method, status, headers) in enumerate(self.server.scripted):
+            if scripted_method == method:
+                del self.server.scripted[index]
+                self.reply(status, {"message": "scripted"}, headers)
+                return True
+        return False
+
+    def do_GET(self):
+        self.server.requests.append(("GET", time.monotonic()))
+        if not self.scripted_answer("GET"):
+            self.reply(200, self.server.issues)
+
+    def do_POST(self):
+        self.server.requests.append(("POST", time.monotonic()))
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.scripted_answer("POST"):
+            return
+        issue = {"title": data["title"], "html_url": f"https://github.invalid/issues/{len(self.server.issues) + 1}"}
+        self.server.issues.append(issue)
+        if self.server.hang_after_create:
+            self.server.hang_after_create -= 1
+            self.server.release.wait(5)
+            return
+        self.reply(201, issue)
+
+
+@pytest.fixture
+def github(monkeypatch, tmp_path):
+    server = StandInGitHub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    waits = []
+    monkeypatch.setattr(watcher, "GITHUB_API_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(watcher, "GITHUB_TOKEN", "test-token")
+    monkeypatch.setattr(watcher, "GITHUB_SESSION", None)
+    monkeypatch.setattr(watcher, "GITHUB_TIMEOUT", 0.5)
+    monkeypatch.setattr(watcher, "NOTIFICATION_REPO", "owner/repo")
+    monkeypatch.setattr(watcher.time, "sleep", waits.append)
+    server.waits = waits
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def count(server, method):
+    return len([request for request in server.requests if request[0] == method])
+
+
+def test_rate_limit_honours_retry_after_seconds(github):
+    github.scripted.append(("GET", 429, {"Retry-After": "7"}))
+    response = watcher.github_request("GET", "/repos/owner/repo/issues")
+    assert response.status_code == 200
+    assert github.waits == [7]
+    assert count(github, "GET") == 2
+
+
+def test_rate_limit_honours_retry_after_http_date(github):
+    github.scripted.append(("GET", 403, {"Retry-After": formatdate(time.time() + 120, usegmt=True)}))
+    response = watcher.github_request("GET", "/repos/owner/repo/issues")
+    assert response.status_code == 200
+    assert len(github.waits) == 1 and 115 <= github.waits[0] <= 121
+
+
+def test_server_errors_back_off_exponentially(github):
+    github.scripted += [("GET", 502, {}), ("GET", 503, {}), ("GET", 500, {})]
+    response = watcher.github_request("GET", "/repos/owner/repo/issues")
+    assert response.status_code == 200
+    assert github.waits == [1, 2, 4]
+
+
+def test_post_that_timed_out_after_creating_the_issue_is_not_sent_again(github):
+    github.hang_after_create = 1
+    assert watcher.create_github_issue("API Change Detected: ck_moe", "body")
+    assert count(github, "POST") == 1
+    assert [issue["title"] for issue in github.issues] == ["API Change Detected: ck_moe"]
+
+
+def test_post_that_failed_before_creating_the_issue_is_sent_again(github):
+    github.scripted.append(("POST", 502, {}))
+    assert watcher.create_github_issue("API Change Detected: ck_moe", "body")
+    assert count(github, "POST") == 2
+    assert len(github.issues) == 1
+
+
+def test_issue_queued_again_after_a_restart_is_not_created_twice(github, tmp_path, monkeypatch):
+    config = {"state_db": str(tmp_path / "state.db"), "notification_outbox_dir": str(tmp_path / "outbox")}
+    monkeypatch.setattr(watcher, "STATE_DB", None)
+    watcher.open_state_store(config)
+    try:
+        watcher.queue_github_issue(config, "API Change Detected: ck_moe", "body")
+        watcher.commit_state()
+        watcher.flush_notifications(config)
+        assert len(github.issues) == 1
+
+        # A restart that redoes the commit queues the same issue again, with a fresh title cache
+        (tmp_path / "outbox" / "known_issue_titles.json").unlink()
+        watcher.queue_github_issue(config, "API Change Detected: ck_moe", "body")
+        watcher.commit_state()
+        watcher.flush_notifications(config)
+    finally:
+        watcher.STATE_DB.close()
+
+    assert count(github, "POST") == 1
+    assert len(github.issues) == 1
+    assert not [name for name in (tmp_path / "outbox").iterdir() if name.name[0].isdigit()]
@@ -0,0 +1,101 @@
+import os
+import textwrap
+
+import aiter_api_watcher as watcher
+
+ENUMS = """
+from enum import IntEnum
+
+
+class ActivationType(IntEnum):
+    No = -1
+    Silu = 0
+    Gelu = 1
+
+
+class QuantType(IntEnum):
+    No = 0
+    per_Token = 2
+"""
+
+FUSED_MOE = """
+from typing import Optional
+
+from .ops.enum import ActivationType, QuantType
+
+
+def ck_moe_2stages(
+    a1,
+    w1,  # [expert(local_expert:EP), inter_dim(*2), dim] N,K
+    w2,  # [expert(local_expert:EP), dim, inter_dim]
+    topk_weight,
+    topk_ids,
+    quant_type=QuantType.No,
+    fc1_scale=None,  # [expert(local_expert:EP), inter_dim, 1]
+    fc2_scale=None,  # [expert(local_expert:EP), model_dim, 1]
+    a1_scale=None,  # [expert(local_expert:EP), 1, model_dim]
+    a2_scale=None,  # [expert(local_expert:EP), 1, inter_dim]
+    block_size: Optional[int] = None,
+    expert_mask: "Optional[list]" = None,
+    activation=ActivationType.Silu,
+    doweight_stage1=False,
+    dtype="bf16",
+) -> Optional[int]:
+    return None
+"""
+
+
+def write_package(root, fused_moe=FUSED_MOE):
+    files = {
+        "aiter/__init__.py": "from .fused_moe import ck_moe_2stages\n",
+        "aiter/ops/__init__.py": "",
+        "aiter/ops/enum.py": ENUMS,
+        "aiter/fused_moe.py": fused_moe,
+    }
+    for path, content in files.items():
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(textwrap.dedent(content))
+
+
+def snapshots(root):
+    """Take the import and the static snapshot of ck_moe_2stages"""
+    import_statement = "from aiter import ck_moe_2stages"
+
+    def read_source(path):
+        full_path = os.path.join(root, path)
+        if not os.path.isfile(full_path):
+            return None
+        with open(full_path) as f:
+            return f.read()
+
+    imported = watcher.check_function_in_subprocess(str(root), import_statement, "ck_moe_2stages")
+    static = watcher.extract_signature_statically(read_source, import_statement, "ck_moe_2stages")
+    return imported, static
+
+
+def test_import_and_static_snapshots_of_ck_moe_2stages_compare_equal(tmp_path):
+    write_package(tmp_path)
+    imported, static = snapshots(tmp_path)
+    assert imported["exists"], imported["error"]
+    assert static["extractor"] == "static"
+    # The raw renderings differ, for example <ActivationType.Silu: 0> against ActivationType.Silu
+    assert imported["parameters"] != static["parameters"]
+
+    assert not watcher.signature_changed(imported, static)
+    assert not watcher.signature_changed(static, imported)
+    assert watcher.diff_signatures(imported, static)["status"] == "unchanged"
+
+
+def test_real_default_change_is_still_reported_across_extractors(tmp_path):
+    write_package(tmp_path)
+    imported, _ = snapshots(tmp_path)
+    changed = tmp_path / "changed"
+    write_package(changed, FUSED_MOE.replace("activation=ActivationType.Silu", "activation=ActivationType.Gelu"))
+    _, static = snapshots(changed)
+
+    assert watcher.signature_changed(imported, static)
+    diff = watcher.diff_signatures(imported, static)
+    assert [change["change"] for change in diff["changes"]] == ["default_changed"]
+    assert diff["changes"][0]["parameter"] == "activation"
@@ -0,0 +1,96 @@
+import os
+import json
+import queue
+import time
+
+import pytest
+import requests
+
+import aiter_api_watcher as watcher
+
+PUSH_PAYLOAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "push_event.json")
+SECRET = "test-webhook-secret"
+
+
+@pytest.fixture
+def listener(monkeypatch):
+    """Start the webhook listener on a free port, queueing the pushes of the watched repository"""
+    monkeypatch.setattr(watcher, "WEBHOOK_SECRET", None)
+    config = {
+        "repository_url": "https://github.com/ROCm/aiter",
+        "webhook_listen": "127.0.0.1:0",
+        "webhook_secret": SECRET
+    }
+    pushes = queue.Queue()
+
+    def on_push(push):
+        if watcher.push_matches(push, config):
+            pushes.put(push)
+
+    server = watcher.start_webhook_listener(config, on_push)
+    assert server is not None
+    config["webhook_listen"] = f"127.0.0.1:{server.server_address[1]}"
+    yield config, pushes
+    server.shutdown()
+    server.server_close()
+
+
+def read_payload():
+    with open(PUSH_PAYLOAD, "rb") as f:
+        return f.read()
+
+
+def post(config, body, signature, event="push"):
+    return requests.post(
+        f"http://{config['webhook_listen']}/",
+        data=body,
+        headers={"Content-Type": "application/json", "X-GitHub-Event": event, "X-Hub-Signature-256": signature},
+        timeout=10
+    )
+
+
+def test_signed_recorded_push_is_accepted(listener):
+    config, pushes = listener
+    assert watcher.post_webhook(config, PUSH_PAYLOAD)
+    push = pushes.get(timeout=5)
+    assert push["ref"] == "refs/heads/main"
+    assert push["after"] == "45c48f00fc699a4f743feab4162d9f92d0f50b19"
+    assert push["commits"] == 1
+
+
+def test_tampered_recorded_push_is_rejected(listener):
+    config, pushes = listener
+    body = read_payload()
+    signature = watcher.sign_webhook_body(SECRET, body)
+    tampered = body.replace(b"45c48f00fc699a4f743feab4162d9f92d0f50b19", b"0" * 40)
+
+    assert post(config, tampered, signature).status_code == 401
+    assert post(config, body, "").status_code == 401
+    assert post(config, body, watcher.sign_webhook_body("wrong-secret", body)).status_code == 401
+    assert pushes.empty()
+    # The untouched payload with its signature still passes
+    assert post(config, body, signature).status_code == 202
+    assert pushes.get(timeout=5)["commits"] == 1
+
+
+def test_pushes_inside_the_debounce_window_make_one_check(listener, caplog):
+    config, pushes = listener
+    debounce = 1.0
+    assert watcher.post_webhook(config, PUSH_PAYLOAD)
+    second = json.loads(read_payload())
+    second["before"], second["after"] = second["after"], "1" * 40
+    body = json.dumps(second).encode()
+    assert post(config, body, watcher.sign_webhook_body(SECRET, body)).status_code == 202
+
+    # One wait, as in the main loop before each check, consumes the whole burst
+    caplog.set_level("INFO", logger=watcher.logger.name)
+    start = time.monotonic()
+    watcher.wait_for_push(pushes, timeout=5, debounce=debounce)
+    assert "Checking after 2 push events" in caplog.text
+    assert time.monotonic() - start < 5
+    assert pushes.empty()
+
+    # No push is left to trigger another check before the next poll
+    start = time.monotonic()
+    watcher.wait_for_push(pushes, timeout=0.2, debounce=debounce)
+    assert time.monotonic() - start < debounce